@@ -0,0 +1,182 @@
+import argparse
+import contextlib
+import csv
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from DataProprocessor import DataPreprocessor
+from Instrumentation import PeakMemory
+from JoinEngine import JoinEngine
+from SalaryStatsMatcher import SalaryStatsMatcher
+from SyntheticData import SyntheticData
+
+results_header = ["version", "date", "scale", "stage", "rows", "seconds", "peak_mb", "rows_per_second"]
+
+
+class StageTimer:
+
+    """
+    Records wall time, peak memory and rows/sec of every stage run through it
+    """
+
+    def __init__(self, scale: int):
+        self.scale = scale
+        self.results = list()
+
+    def time(self, stage: str, rows: int, func, *args, **kwargs):
+        with PeakMemory() as memory:
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+
+        self.results.append({
+            "scale": self.scale,
+            "stage": stage,
+            "rows": rows,
+            "seconds": round(seconds, 4),
+            "peak_mb": round(memory.peak, 1),
+            "rows_per_second": round(rows / seconds) if seconds > 0 else None,
+        })
+        return result
+
+    def wrap(self, obj, method: str, rows):
+        """
+        Time every call of obj.method, rows is a count or a function of the call arguments giving the count
+        """
+        func = getattr(obj, method)
+
+        def timed(*args, **kwargs):
+            count = rows(*args, **kwargs) if callable(rows) else rows
+            return self.time(method, count, func, *args, **kwargs)
+
+        setattr(obj, method, timed)
+
+
+def countRows(path: str) -> int:
+    lines = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            lines += block.count(b"\n")
+    # header line
+    return lines - 1
+
+
+def runScale(data_path: str, scale: int) -> list:
+    """
+    Run DataPreprocessor and SalaryStatsMatcher on the data of 1 scale, timing every step
+    Nothing is reused from a previous run, the raw files are parsed and every name is matched again
+    """
+    raw_data_path = os.path.join(data_path, "raw_statistics")
+    shutil.rmtree(os.path.join(data_path, "cache"), ignore_errors=True)
+    shutil.rmtree(os.path.join(data_path, "partitions"), ignore_errors=True)
+    rows = {file_name: countRows(os.path.join(raw_data_path, file_name)) for file_name in os.listdir(raw_data_path)}
+    salary_rows = countRows(os.path.join(data_path, "nba_player_salaries.csv"))
+    timer = StageTimer(scale)
+
+    # the steps print their progress, which is not part of the benchmark output
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        preprocessor = DataPreprocessor(raw_data_path, data_path, run=False)
+        player_df = timer.time("getSalaryYearsPlayerRecord", rows["Player Season Info.csv"], preprocessor.getSalaryYearsPlayerRecord)
+        preprocessor.join_engine = JoinEngine(player_df)
+        for step, file_name in DataPreprocessor.join_steps.items():
+            timer.time(step, rows[file_name], getattr(preprocessor, step))
+        preprocessor.unique_player_record_df = timer.time("join", len(player_df), preprocessor.join_engine.join)
+        timer.time("saveAllStats", len(preprocessor.unique_player_record_df), preprocessor.saveAllStats)
+
+        matcher = SalaryStatsMatcher(use_cache=False, raw_data_path=raw_data_path, data_path=data_path, run=False)
+        timer.time("loadSalaries", salary_rows, matcher.loadSalaries)
+        # each matching case is timed on its own within nameMatching
+        timer.wrap(matcher, "buildDisambiguationIndex", lambda repeated_names, career_info: len(repeated_names))
+        timer.wrap(matcher, "matchRepeatedNames", salary_rows)
+        timer.wrap(matcher, "matchDirectNames", salary_rows)
+        timer.wrap(matcher, "matchFuzzyNames", lambda stat_players, need_fuzzy_names, *args: len(need_fuzzy_names))
+        timer.time("nameMatching", salary_rows, matcher.nameMatching)
+        timer.time("mergeSalaries", salary_rows, matcher.mergeSalaries)
+
+    return timer.results
+
+
+def getVersion() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Benchmark:
+
+    """
+    Times DataPreprocessor and SalaryStatsMatcher on synthetic data of increasing size
+
+    Every add* step and every name matching case is timed on its own and the results are appended to results_file with
+    the code version so runs of different versions can be compared.
+    Each scale runs in a fresh process so its peak memory does not include the previous scales.
+    """
+
+    def __init__(self, scales: list = (1, 10, 100), work_path: str = "./data/cache/benchmark",
+                 results_file: str = "./data/benchmark_results.csv", generator: SyntheticData = None):
+        self.scales = scales
+        self.work_path = work_path
+        self.results_file = results_file
+        self.generator = generator or SyntheticData()
+
+    def run(self, regenerate: bool = False) -> list:
+        version, date = getVersion(), datetime.now().isoformat(timespec="seconds")
+        all_results = list()
+        for scale in self.scales:
+            data_path = os.path.join(self.work_path, f"scale_{scale}")
+            if regenerate or not os.path.exists(os.path.join(data_path, "nba_player_salaries.csv")):
+                print(f"Generating {scale}x data in {data_path}")
+                self.generator.generate(scale, data_path)
+
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                results = executor.submit(runScale, data_path, scale).result()
+            results = [{"version": version, "date": date, **result} for result in results]
+            self.printResults(results)
+            self.saveResults(results)
+            all_results += results
+        return all_results
+
+    def saveResults(self, results: list):
+        os.makedirs(os.path.dirname(os.path.abspath(self.results_file)), exist_ok=True)
+        is_new = not os.path.exists(self.results_file)
+        with open(self.results_file, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=results_header)
+            if is_new:
+                writer.writeheader()
+            writer.writerows(results)
+
+    def printResults(self, results: list):
+        print(f"{'stage':<28}{'scale':>6}{'rows':>12}{'seconds':>10}{'peak MB':>10}{'rows/s':>12}")
+        for result in results:
+            print(
+                f"{result['stage']:<28}{result['scale']:>6}{result['rows']:>12}{result['seconds']:>10.3f}"
+                f"{result['peak_mb']:>10.0f}{result['rows_per_second'] or 0:>12}"
+            )
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Benchmark DataPreprocessor and SalaryStatsMatcher on scaled up synthetic data")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="number of copies of the data")
+    parser.add_argument("--results-file", default="./data/benchmark_results.csv")
+    parser.add_argument("--work-path", default="./data/cache/benchmark", help="where the synthetic data is generated")
+    parser.add_argument("--regenerate", action="store_true", help="generate the synthetic data again even if it exists")
+    parser.add_argument("--collision-rate", type=float, default=0.05, help="share of synthetic players named after another player")
+    parser.add_argument("--misspelling-rate", type=float, default=0.05, help="share of synthetic players with a typo in their salary name")
+    parser.add_argument("--raw-data-path", default="./data/raw_statistics")
+    parser.add_argument("--data-path", default="./data")
+    args = parser.parse_args(argv)
+
+    generator = SyntheticData(args.raw_data_path, args.data_path, args.collision_rate, args.misspelling_rate)
+    Benchmark(args.scales, args.work_path, args.results_file, generator).run(regenerate=args.regenerate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import pandas as pd
+
+from util import fileFingerprint
+
+try:
+    import pyarrow.feather as feather
+    import pyarrow.ipc as ipc
+except ImportError:
+    # without pyarrow the cache falls back to pickle, which cannot read a subset of columns from disk
+    feather = None
+
+# extension of the columnar files written by writeFrame
+frame_extension = ".feather" if feather is not None else ".pkl"
+
+
+def writeFrame(df: pd.DataFrame, path: str):
+    """
+    Write a frame to a columnar file, path is given without extension
+    The file is written next to its final path and renamed, a reader never sees it half written
+    """
+    # one temporary file per process, several processes may build the same copy at once
+    tmp_file = f"{path}{frame_extension}.{os.getpid()}.tmp"
+    if feather is not None:
+        feather.write_feather(df.reset_index(drop=True), tmp_file)
+    else:
+        df.to_pickle(tmp_file)
+    os.replace(tmp_file, path + frame_extension)
+
+
+def writeMetadata(metadata: dict, metadata_file: str):
+    tmp_file = f"{metadata_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_file, metadata_file)
+
+
+def readFrame(path: str, columns: list = None, drop: list = None) -> pd.DataFrame:
+    """
+    Read the given columns of a file written by writeFrame, or all columns but the dropped ones
+    """
+    if feather is None:
+        df = pd.read_pickle(path + frame_extension)
+        return df[ColumnarCache.selectColumns(df.columns, columns, drop)]
+
+    with ipc.open_file(path + frame_extension) as reader:
+        schema = reader.schema.names
+    return feather.read_feather(path + frame_extension, columns=ColumnarCache.selectColumns(schema, columns, drop))
+
+
+class ColumnarCache:
+
+    """
+    Columnar copies of CSV files, materialized on first use and rebuilt when the source file changes
+    """
+
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+
+    def read(self, csv_path: str, parse, columns: list = None, drop: list = None, options: str = "") -> pd.DataFrame:
+        """
+        Read csv_path from its columnar copy, parse(csv_path) is called to build the copy when it is missing or stale
+        options describes how parse reads the file so a change of dtypes also rebuilds the copy
+        Only the given columns are read, or all but the dropped ones
+        """
+        data_file, metadata_file = self.getFiles(csv_path, options)
+        if not self.isFresh(csv_path, data_file, metadata_file, options):
+            self.write(csv_path, parse(csv_path), data_file, metadata_file, options)
+
+        return readFrame(data_file, columns=columns, drop=drop)
+
+    def store(self, csv_path: str, df: pd.DataFrame, options: str = ""):
+        """
+        Save df as the columnar copy of csv_path, e.g. a frame just written to csv_path, so the next read does not parse it
+        """
+        self.write(csv_path, df, *self.getFiles(csv_path, options), options)
+
+    def getFiles(self, csv_path: str, options: str) -> tuple:
+        """
+        Data file, without extension, and metadata file of a copy
+        Each options string gets its own copy, e.g. the plain and compact copies of a csv do not replace each other
+        """
+        name = os.path.basename(csv_path)
+        if options:
+            name += "." + hashlib.sha1(options.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.cache_path, name), os.path.join(self.cache_path, name + ".json")
+
+    @staticmethod
+    def selectColumns(all_columns, columns: list = None, drop: list = None) -> list:
+        if columns is not None:
+            return list(columns)
+        missing = [column for column in drop or [] if column not in all_columns]
+        if missing:
+            raise KeyError(f"{missing} not found in columns")
+        return [column for column in all_columns if column not in (drop or [])]
+
+    def isFresh(self, csv_path: str, data_file: str, metadata_file: str, options: str) -> bool:
+        if not os.path.exists(data_file + frame_extension) or not os.path.exists(metadata_file):
+            return False
+        with open(metadata_file) as f:
+            metadata = json.load(f)
+        if metadata.get("options") != options:
+            return False
+
+        stat = os.stat(csv_path)
+        if metadata["mtime"] == stat.st_mtime and metadata["size"] == stat.st_size:
+            return True
+        # touched but possibly unchanged, the content hash decides
+        if metadata["sha1"] != fileFingerprint(csv_path):
+            return False
+        metadata["mtime"], metadata["size"] = stat.st_mtime, stat.st_size
+        writeMetadata(metadata, metadata_file)
+        return True
+
+    def write(self, csv_path: str, df: pd.DataFrame, data_file: str, metadata_file: str, options: str):
+        os.makedirs(self.cache_path, exist_ok=True)
+        stat = os.stat(csv_path)
+        # the data goes first, metadata describing it is only in place once the data is complete
+        writeFrame(df, data_file)
+        writeMetadata({
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "sha1": fileFingerprint(csv_path),
+            "options": options,
+        }, metadata_file)
@@ -0,0 +1,100 @@
+import os
+import numpy as np
+import pandas as pd
+
+from ColumnarCache import ColumnarCache
+
+# The compact dtype of every column is decided by its name and the dtype of the csv column, never by the values of the
+# rows at hand, so a few seasons compacted on their own get the same dtypes as the whole table
+
+# columns kept as categoricals, any other text column is also made categorical, e.g. All-NBA
+categorical_columns = ["player", "pos", "tm", "playoffs"]
+# identifiers, never missing, stored as the smallest int holding every id
+key_columns = {"season": np.int16, "seas_id": np.int32, "player_id": np.int32}
+# award flags, True / False / NaN stored as float32 1 / 0 / NaN
+flag_suffix = "_winner"
+flag_values = {True: 1.0, False: 0.0, "True": 1.0, "False": 0.0}
+# columns kept in float64, float32 keeps ~7 significant digits which is not enough for a salary
+precise_columns = ["salary"]
+# stored sparse: the award columns and birth year are NaN for almost every player season, the vote shares mostly 0
+sparse_nan_suffixes = ("_share", flag_suffix)
+sparse_nan_columns = ["birth_year"]
+sparse_zero_columns = ["share", "All Star?"]
+
+# describes the compact copies in ColumnarCache so they are not mixed up with the plain copies of the same csv
+compact_options = "compact v2"
+precise_options = "compact v2 precise"
+
+
+def compactFrame(df: pd.DataFrame, sparse: bool = True, precise: bool = False) -> pd.DataFrame:
+    """
+    Smaller copy of all_stats or overall_stats_salary
+    Text columns become categoricals and the ids the smallest int dtype holding them. Without precise the award flags
+    become float32 1 / 0, the other statistics float32 and the award columns sparse
+    precise keeps every statistic and flag as it is, e.g. to write the frame back to csv without losing digits
+    """
+    columns = dict()
+    for column in df.columns:
+        values = df[column]
+        is_text = values.dtype == object or values.dtype == "boolean" or isinstance(values.dtype, pd.CategoricalDtype)
+        if column.endswith(flag_suffix) and not precise:
+            values = values.astype(object).map(flag_values).astype(np.float32)
+        elif column in categorical_columns or is_text:
+            values = values.astype("category")
+        elif column in key_columns:
+            values = values.astype(key_columns[column])
+        elif precise or column in precise_columns or not pd.api.types.is_numeric_dtype(values):
+            pass
+        else:
+            values = values.astype(np.float32)
+        columns[column] = values
+
+    df = pd.DataFrame(columns, index=df.index)
+    return toSparse(df) if sparse else df
+
+
+def toSparse(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Store the award columns, mostly NaN, and the vote shares, mostly 0, as sparse columns
+    """
+    df = df.copy()
+    for column in df.columns:
+        values = df[column]
+        if not pd.api.types.is_float_dtype(values) or isinstance(values.dtype, pd.SparseDtype):
+            continue
+        if column.endswith(sparse_nan_suffixes) or column in sparse_nan_columns:
+            df[column] = values.astype(pd.SparseDtype(values.dtype, np.nan))
+        elif column in sparse_zero_columns:
+            df[column] = values.astype(pd.SparseDtype(values.dtype, 0))
+    return df
+
+
+def toDense(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Plain copy of a frame with sparse columns, e.g. for scikit-learn which does not accept a mix of sparse and dense columns
+    """
+    return df.astype({
+        column: dtype.subtype for column, dtype in df.dtypes.items() if isinstance(dtype, pd.SparseDtype)
+    })
+
+
+def readStats(csv_path: str, cache_path: str = None, columns: list = None, sparse: bool = True, precise: bool = False) -> pd.DataFrame:
+    """
+    Read all_stats.csv or overall_stats_salary.csv as a compact frame, see compactFrame for precise
+    The compact frame is kept as a columnar copy under cache_path, ./data/cache by default, so the csv is parsed once
+    """
+    cache_path = cache_path or os.path.join(os.path.dirname(csv_path), "cache")
+    # the columnar copy is stored dense, pyarrow has no sparse columns
+    df = ColumnarCache(cache_path).read(
+        csv_path, lambda path: compactFrame(pd.read_csv(path), sparse=False, precise=precise),
+        columns=columns, options=precise_options if precise else compact_options
+    )
+    return toSparse(df) if sparse else df
+
+
+def storeStats(csv_path: str, df: pd.DataFrame, cache_path: str = None):
+    """
+    Save the compact copy of df, just written to csv_path, so readStats does not parse the csv again
+    """
+    cache_path = cache_path or os.path.join(os.path.dirname(csv_path), "cache")
+    ColumnarCache(cache_path).store(csv_path, compactFrame(df, sparse=False), options=compact_options)
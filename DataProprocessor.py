@@ -1,9 +1,14 @@
 import pandas as pd
-import numpy as np
 import os
 import warnings
 
-from util import na_values
+from CompactStats import storeStats
+from Instrumentation import Instrumentation, instrumented
+from JoinEngine import JoinEngine, TableCollector
+from RawDataLoader import RawDataLoader
+from SalaryIngestion import parseSeasons
+from SeasonPartitions import SeasonPartitions
+from util import peakMemoryMB
 
 class DataPreprocessor:
 
@@ -11,119 +16,214 @@ class DataPreprocessor:
     Mainly for cleaning and combining all raw data files and combine into 1 file
     """
 
-    def __init__(self):
+    # Processing files 1-by-1 as different file requires slightly different processing
+    # Each step and the raw file it reads, in the order the columns are joined
+    # Opponents stats by team is not useful in my opinion, ignorign those files
+    join_steps = {
+        "addAdvancedRecords": "Advanced.csv",
+        "addAllStarSelection": "All-Star Selections.csv",
+        "addEndOfSeasonTeamsVoting": "End of Season Teams (Voting).csv",
+        "addEndOfSeasonTeams": "End of Season Teams.csv",
+        "addPer36Min": "Per 36 Minutes.csv",
+        "addPer100Pos": "Per 100 Poss.csv",
+        "addPlayerAward": "Player Award Shares.csv",
+        "addPlayerPlayByPlay": "Player Play By Play.csv",
+        "addPlayerShooting": "Player Shooting.csv",
+        "addTeamSummaries": "Team Summaries.csv",
+    }
+
+    def __init__(self, raw_data_path: str = "./data/raw_statistics", data_path: str = "./data", run: bool = True, seasons: list = None,
+                 chunk_size: int = None, instrumentation: Instrumentation = None, compact: bool = False,
+                 export_formats: list = ("csv",), n_jobs: int = None):
         # ignore pd warnings when reading large data files
         warnings.filterwarnings('ignore')
-        self.raw_data_path = "./data/raw_statistics"
-        self.data_path = "./data"
+        self.raw_data_path = raw_data_path
+        self.data_path = data_path
+        # raw files are parsed once into columnar copies under ./data/cache
+        self.loader = RawDataLoader(self.raw_data_path, os.path.join(self.data_path, "cache", "raw_statistics"))
+        # all_stats.csv is also kept per season so a new season can be added without rebuilding the others
+        # export_formats adds csv.gz / feather partitions, written by n_jobs threads
+        self.all_stats_partitions = SeasonPartitions(os.path.join(self.data_path, "all_stats.csv"), export_formats, n_jobs)
+        # seasons to refresh, None rebuilds every season
+        self.seasons = seasons
+        # number of seasons joined at a time, None joins all seasons at once
+        self.chunk_size = chunk_size
+        # also keep a compact columnar copy of all_stats.csv for the analysis, read with readStats
+        self.compact = compact
+        # timings, memory and counters of every step, saved to ./data/run_report.json by run()
+        self.instrumentation = instrumentation or Instrumentation()
+
+        # run=False only sets up the paths so the steps can be run 1-by-1, e.g. by Pipeline
+        if run:
+            self.run()
 
+    def run(self):
         # get a unique list of season+player record
-        self.unique_player_record_df = self.getUniquePlayerRecord()
+        player_df = self.getSalaryYearsPlayerRecord()
 
-        # retain only record for years which we have salary data
-        salary_df = pd.read_csv(os.path.join(self.data_path, "nba_player_salaries.csv"))
-        years = salary_df["Year"].drop_duplicates().to_list()
-        year_range = [int(str(year).split("-")[0]) for year in years]
+        if self.chunk_size is not None:
+            self.runChunks(player_df, self.collectSideTables())
+        else:
+            self.unique_player_record_df = self.joinAll(self.selectSeasons(player_df))
+            if not self.canUpsert(self.unique_player_record_df):
+                print("all_stats.csv columns changed, rebuilding every season")
+                self.unique_player_record_df = self.joinAll(player_df)
+            self.saveAllStats()
+        self.instrumentation.save(os.path.join(self.data_path, "run_report.json"), "DataPreprocessor")
 
-        self.unique_player_record_df = self.unique_player_record_df[self.unique_player_record_df["season"].isin(year_range)]
+    def joinAll(self, player_df: pd.DataFrame) -> pd.DataFrame:
+        # each file is aligned to the player records by the join engine and the wide table is assembled once at the end
+        self.join_engine = JoinEngine(player_df)
+        for step in self.join_steps:
+            getattr(self, step)()
+        with self.instrumentation.stage("join"):
+            return self.join_engine.join()
 
-        # Processing files 1-by-1 as different file requires slightly different processing
-        self.addAdvancedRecords()
-        
-        self.addAllStarSelection()
-        self.addEndOfSeasonTeamsVoting()
-        self.addEndOfSeasonTeams()
-        # Opponents stats by team is not useful in my opinion, ignorign those files
-        self.addPer36Min()
-        self.addPer100Pos()
-        self.addPlayerAward()
+    def collectSideTables(self) -> list:
+        # every step's table prepared once, as (table, join keys, fill value)
+        self.join_engine = TableCollector()
+        for step in self.join_steps:
+            getattr(self, step)()
+        return self.join_engine.tables
+
+    @staticmethod
+    def joinTables(player_df: pd.DataFrame, side_tables) -> pd.DataFrame:
+        join_engine = JoinEngine(player_df)
+        for df, on, fill_value in side_tables:
+            join_engine.add(df, on=on, fill_value=fill_value)
+        return join_engine.join()
+
+    def runChunks(self, player_df: pd.DataFrame, side_tables: list):
+        """
+        Join and write chunk_size seasons at a time, only the side tables and 1 chunk of all_stats are held in memory
+        Each chunk is written to its season partitions, all_stats.csv is the same as joining all seasons at once
+        """
+        selected_df = self.selectSeasons(player_df)
+        # an empty join gives the columns to check against the stored seasons
+        if not self.canUpsert(self.joinTables(selected_df.iloc[:0], side_tables)):
+            print("all_stats.csv columns changed, rebuilding every season")
+            selected_df = player_df
+
+        seasons = sorted(selected_df["season"].unique())
+        for start in range(0, len(seasons), self.chunk_size):
+            chunk_seasons = seasons[start:start + self.chunk_size]
+            with self.instrumentation.stage(f"chunk {chunk_seasons[0]}-{chunk_seasons[-1]}"):
+                chunk_df = self.joinTables(selected_df[selected_df["season"].isin(chunk_seasons)], side_tables)
+                export_report = self.all_stats_partitions.write(chunk_df.drop_duplicates(), chunk_seasons)
+                self.instrumentation.countExport("all_stats", export_report)
+                self.instrumentation.count("all_stats_rows", len(chunk_df))
+                del chunk_df
+
+        with self.instrumentation.stage("combine"):
+            self.all_stats_partitions.removeStale(seasons, self.seasons)
+            self.all_stats_partitions.combine()
+        print(f"all_stats.csv written in chunks of {self.chunk_size} seasons, peak RSS {peakMemoryMB():.0f} MB")
+        print(f"all_stats partitions: {self.instrumentation.exportSummary('all_stats', self.all_stats_partitions.formats)}")
 
-        self.addPlayerPlayByPlay()
-        self.addPlayerShooting()
-        self.addTeamSummaries()
+    def selectSeasons(self, player_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Records of the seasons to refresh, all records when there is no previous all_stats to update
+        """
+        if self.seasons is None or not self.all_stats_partitions.exists():
+            return player_df
+        return player_df[player_df["season"].isin(self.seasons)]
+
+    def canUpsert(self, df: pd.DataFrame) -> bool:
+        # the side files are processed whole so the columns only change when e.g. a new award shows up
+        return self.seasons is None or self.all_stats_partitions.matches(df.columns)
+
+    @instrumented
+    def saveAllStats(self):
         self.unique_player_record_df.drop_duplicates(inplace=True)
-        self.unique_player_record_df.to_csv(os.path.join(self.data_path,"all_stats.csv"), header=True, index=False)
+        self.instrumentation.count("all_stats_rows", len(self.unique_player_record_df))
+        # seasons in the frame replace their partitions, all_stats.csv is then rebuilt from the partitions
+        export_report = self.all_stats_partitions.write(self.unique_player_record_df, self.seasons)
+        self.instrumentation.countExport("all_stats", export_report)
+        self.all_stats_partitions.combine()
+        print(f"all_stats partitions: {self.instrumentation.exportSummary('all_stats', self.all_stats_partitions.formats)}")
+        # with seasons the frame is only a part of the file, the copy is then rebuilt from the csv when it is read
+        if self.compact and self.seasons is None:
+            storeStats(self.all_stats_partitions.output_file, self.unique_player_record_df)
+
+    @instrumented
+    def getSalaryYearsPlayerRecord(self) -> pd.DataFrame:
+        player_df = self.getUniquePlayerRecord()
+
+        # retain only record for years which we have salary data
+        salary_df = pd.read_csv(os.path.join(self.data_path, "nba_player_salaries.csv"), usecols=["Year"], dtype=str)
+        year_range = parseSeasons(salary_df["Year"].drop_duplicates()).to_list()
+
+        return player_df[player_df["season"].isin(year_range)]
         
     def getUniquePlayerRecord(self) -> pd.DataFrame():
         
-        player_df = pd.read_csv(os.path.join(self.raw_data_path,"Player Season Info.csv"), na_values=na_values, keep_default_na=False)
-        player_df = player_df[["season","seas_id","player_id","player","birth_year","pos","age","tm","experience"]]
+        player_df = self.loader.load("Player Season Info.csv", columns=["season","seas_id","player_id","player","birth_year","pos","age","tm","experience"])
         
         # Fill age year by season - birth_year
-        for i, row in player_df.iterrows():
-            if row["birth_year"] != "NA" and row["age"] == "NA":
-                player_df.at[i, "age"] = int(row["season"]) - int(row["birth_year"])
-                
+        player_df["age"] = player_df["age"].fillna(player_df["season"] - player_df["birth_year"])
+        
         return player_df
 
+    @instrumented
     def addAdvancedRecords(self):
         file_name = "Advanced.csv"
-        df = pd.read_csv(os.path.join(self.raw_data_path, file_name), na_values=na_values, keep_default_na=False)
-        
         # Drop unneccessary columns
-        df = df.drop(["season","player_id","player","birth_year","pos","age","tm","experience", "lg"], axis=1)
+        df = self.loader.load(file_name, drop=["season","player_id","player","birth_year","pos","age","tm","experience", "lg"])
 
-        self.unique_player_record_df = pd.merge(self.unique_player_record_df, df, on=["seas_id"], how="left")
+        self.join_engine.add(df, on=["seas_id"])
 
+    @instrumented
     def addAllStarSelection(self):
         """
         Fill 1 for all start players and 0 for not all star
         """
         file_name = "All-Star Selections.csv"
-        df = pd.read_csv(os.path.join(self.raw_data_path, file_name), na_values=na_values, keep_default_na=False)
-
-        df = df[["player", "season"]]
-        df["All Star?"] = 1
+        df = self.loader.load(file_name, columns=["player", "season"])
+        # float as the players not selected are filled after the join, so every season gets the same dtype
+        df["All Star?"] = 1.0
         
-        # Combining the dataframes, players selected as all star will be tagged 1 and remaining will be NaN
-        self.unique_player_record_df = pd.merge(self.unique_player_record_df, df, on=['player', 'season'], how='left')
-        self.unique_player_record_df["All Star?"].fillna(0, inplace=True)
+        # Combining the dataframes, players selected as all star will be tagged 1 and remaining will be 0
+        self.join_engine.add(df, on=["player", "season"], fill_value=0)
     
+    @instrumented
     def addEndOfSeasonTeamsVoting(self):
         file_name = "End of Season Teams (Voting).csv"
-        df = pd.read_csv(os.path.join(self.raw_data_path, file_name), na_values=na_values, keep_default_na=False)
-        
         # Drop unneccessary columns
         # number_tm is duplicated with End Of Season Teams so removed
-        df = df.drop(["season","player_id","player", "lg", "age", "type", "position", "tm", "pts_won", "pts_max", "number_tm"], axis=1)
+        df = self.loader.load(file_name, drop=["season","player_id","player", "lg", "age", "type", "position", "tm", "pts_won", "pts_max", "number_tm"])
 
-        self.unique_player_record_df = pd.merge(self.unique_player_record_df, df, on=["seas_id"], how="left")
         # Replace NA with 0 assuming 0 votes received
-        self.unique_player_record_df[["share","x1st_tm","x2nd_tm","x3rd_tm"]] = self.unique_player_record_df[["share","x1st_tm","x2nd_tm","x3rd_tm"]].replace({"NA": 0, np.nan: 0})
+        self.join_engine.add(df, on=["seas_id"], fill_value=0)
 
 
+    @instrumented
     def addEndOfSeasonTeams(self):
         file_name = "End of Season Teams.csv"
-        df = pd.read_csv(os.path.join(self.raw_data_path, file_name), na_values=na_values, keep_default_na=False)
-        
         # Drop unneccessary columns
-        df = df.drop(["season","lg","player_id","player","position","birth_year","tm","age"], axis=1)
+        df = self.loader.load(file_name, drop=["season","lg","player_id","player","position","birth_year","tm","age"])
         
         # Replace ABA and BAA by NBA
         df["type"] = df["type"].replace({"All-ABA": "All-NBA", "All-BAA": "All-NBA"})
 
         
         awards = df["type"].drop_duplicates().to_list()
-        temp_dfs = list()
-        # Create a temp df for each award
-        # Split into a few columns as 1 player can have mutliple awards
-        for award in awards:
-            temp_df = df[df["type"]==award]
-            temp_df = temp_df.rename(columns={"number_tm": award})
-            temp_df = temp_df.drop(["type"], axis=1)
-            temp_df = temp_df.reset_index(drop=True)
-            temp_dfs += [temp_df]
-        
-        # Add each result back to main df
-        for temp_df in temp_dfs:
-            self.unique_player_record_df = pd.merge(self.unique_player_record_df, temp_df, on=["seas_id"], how="left")
+        if df.duplicated(["seas_id", "type"]).any():
+            # pivot raises on a player on the same team type twice in a season, joined 1 award at a time instead
+            # which repeats his row like the merges did
+            for award in awards:
+                self.join_engine.add(df[df["type"] == award].drop(["type"], axis=1).rename(columns={"number_tm": award}), on=["seas_id"])
+            return
+        # Pivot to 1 column per award as 1 player can have mutliple awards
+        df = df.pivot(index="seas_id", columns="type", values="number_tm")[awards]
+        df.columns.name = None
+        
+        self.join_engine.add(df.reset_index(), on=["seas_id"])
 
+    @instrumented
     def addPer36Min(self):
         file_name = "Per 36 Minutes.csv"
-        df = pd.read_csv(os.path.join(self.raw_data_path, file_name), na_values=na_values, keep_default_na=False)
-        
         # Drop unneccessary columns
-        df = df.drop(["season","player_id", "player", "birth_year", "pos", "age", "experience", "lg", "g", "gs", "mp", "tm"], axis=1)
+        df = self.loader.load(file_name, drop=["season","player_id", "player", "birth_year", "pos", "age", "experience", "lg", "g", "gs", "mp", "tm"])
         
         advanced_stats = [
             "fg_per_36_min","fga_per_36_min","fg_percent","x3p_per_36_min","x3pa_per_36_min","x3p_percent","x2p_per_36_min",
@@ -132,7 +232,7 @@ class DataPreprocessor:
         ]
         
         # Replace NA with 0s
-        df[advanced_stats] = df[advanced_stats].replace("NA", 0)
+        df[advanced_stats] = df[advanced_stats].fillna(0)
         df.rename(columns={
                                 "fg_percent": "fg_percent_per_36_min", 
                                 "ft_percent": "ft_percent_per_36_min",
@@ -140,14 +240,13 @@ class DataPreprocessor:
                                 "x3p_percent": "x3p_percent_per_36_min"
                            })
         
-        self.unique_player_record_df = pd.merge(self.unique_player_record_df, df, on=["seas_id"], how="left")
+        self.join_engine.add(df, on=["seas_id"])
         
+    @instrumented
     def addPer100Pos(self):
         file_name = "Per 100 Poss.csv"
-        df = pd.read_csv(os.path.join(self.raw_data_path, file_name), na_values=na_values, keep_default_na=False)
-        
         # Drop unneccessary columns
-        df = df.drop(["season","player_id", "player", "birth_year", "pos", "age", "experience", "lg", "g", "gs", "mp","tm"], axis=1)
+        df = self.loader.load(file_name, drop=["season","player_id", "player", "birth_year", "pos", "age", "experience", "lg", "g", "gs", "mp","tm"])
         
         advanced_stats = [
             "fg_per_100_poss","fga_per_100_poss","fg_percent","x3p_per_100_poss","x3pa_per_100_poss","x3p_percent",'x2p_per_100_poss',
@@ -157,7 +256,7 @@ class DataPreprocessor:
         ]
         
         # Replace NA with 0s
-        df[advanced_stats] = df[advanced_stats].replace("NA", 0)
+        df[advanced_stats] = df[advanced_stats].fillna(0)
         df.rename(columns={
             "fg_percent": "fg_percent_per_100_poss", 
             "ft_percent": "ft_percent_per_100_poss",
@@ -167,48 +266,45 @@ class DataPreprocessor:
             "d_rtg": "d_rtg_per_100_poss"
         })
 
-        self.unique_player_record_df = pd.merge(self.unique_player_record_df, df, on=["seas_id"], how="left")
+        self.join_engine.add(df, on=["seas_id"])
         
+    @instrumented
     def addPlayerAward(self):
         file_name = "Player Award Shares.csv"
-        df = pd.read_csv(os.path.join(self.raw_data_path, file_name), na_values=na_values, keep_default_na=False)
-        
         # Drop unneccessary columns
-        df = df.drop(["season","player", "age", "tm", "first", "pts_won", "pts_max", "player_id"], axis=1)
+        df = self.loader.load(file_name, drop=["season","player", "age", "tm", "first", "pts_won", "pts_max", "player_id"])
         
         df["award"] = df["award"].replace({"aba mvp": "nba mvp", "aba roy": "nba roy"})
         
         awards = df["award"].drop_duplicates().to_list()
-        
-        temp_dfs = list()
-        # Create a temp df for each award
-        # Split into a few columns as 1 player can have mutliple awards
-        for award in awards:
-            temp_df = df[df["award"]==award]
-            temp_df = temp_df.rename(columns={"share": f"{award}_share", "winner": f"{award}_winner"})
-            temp_df = temp_df.drop(["award"], axis=1)
-            temp_df = temp_df.reset_index(drop=True)
-            temp_dfs += [temp_df]
-        
-        # Add each result back to main df
-        for temp_df in temp_dfs:
-            self.unique_player_record_df = pd.merge(self.unique_player_record_df, temp_df, on=["seas_id"], how="left")
+        if df.duplicated(["seas_id", "award"]).any():
+            # pivot raises on a player with 2 shares of the same award in a season, joined 1 award at a time instead
+            # which repeats his row like the merges did
+            for award in awards:
+                award_df = df[df["award"] == award].drop(["award"], axis=1)
+                self.join_engine.add(award_df.rename(columns={"share": f"{award}_share", "winner": f"{award}_winner"}), on=["seas_id"])
+            return
+        
+        # Pivot to a share and winner column per award as 1 player can have mutliple awards
+        df = df.pivot(index="seas_id", columns="award", values=["share", "winner"])
+        df = df[[(value, award) for award in awards for value in ["share", "winner"]]]
+        df.columns = [f"{award}_{value}" for value, award in df.columns]
+        
+        self.join_engine.add(df.reset_index(), on=["seas_id"])
     
+    @instrumented
     def addPlayerPerGame(self):
         file_name = "Player Per Game.csv"
-        df = pd.read_csv(os.path.join(self.raw_data_path, file_name), na_values=na_values, keep_default_na=False)
-        
         # Drop unneccessary columns
-        df = df.drop(["season","player_id","player","birth_year","pos","age","experience","lg","tm","g","gs"], axis=1)
+        df = self.loader.load(file_name, drop=["season","player_id","player","birth_year","pos","age","experience","lg","tm","g","gs"])
 
-        self.unique_player_record_df = pd.merge(self.unique_player_record_df, df, on=["seas_id"], how="left")
+        self.join_engine.add(df, on=["seas_id"])
     
+    @instrumented
     def addPlayerPlayByPlay(self):
         file_name = "Player Play By Play.csv"
-        df = pd.read_csv(os.path.join(self.raw_data_path, file_name), na_values=na_values, keep_default_na=False)
-        
         # Drop unneccessary columns
-        df = df.drop(["season","player_id","player","birth_year","pos","age","experience","lg","g","mp","tm"], axis=1)
+        df = self.loader.load(file_name, drop=["season","player_id","player","birth_year","pos","age","experience","lg","g","mp","tm"])
         
         numerical_cols = [
             "pg_percent","sg_percent","sf_percent","pf_percent","c_percent","on_court_plus_minus_per_100_poss","net_plus_minus_per_100_poss",
@@ -216,44 +312,35 @@ class DataPreprocessor:
             "offensive_foul_drawn","points_generated_by_assists","and1","fga_blocked"
         ]
         
-        df[numerical_cols] = df[numerical_cols].replace("NA", 0)
-        self.unique_player_record_df = pd.merge(self.unique_player_record_df, df, on=["seas_id"], how="left")
+        df[numerical_cols] = df[numerical_cols].fillna(0)
+        self.join_engine.add(df, on=["seas_id"])
     
+    @instrumented
     def addPlayerShooting(self):
         file_name = "Player Shooting.csv"
-        df = pd.read_csv(os.path.join(self.raw_data_path, file_name), na_values=na_values, keep_default_na=False)
-        
         # Drop unneccessary columns
-        df = df.drop(["season","player_id","player","birth_year","pos","age","experience","lg","g","mp","tm"], axis=1)
+        df = self.loader.load(file_name, drop=["season","player_id","player","birth_year","pos","age","experience","lg","g","mp","tm"])
         
         numerical_cols = df.columns.tolist()
         numerical_cols.remove("seas_id")
         
-        df[numerical_cols] = df[numerical_cols].replace("NA", 0)
+        df[numerical_cols] = df[numerical_cols].fillna(0)
         
-        self.unique_player_record_df = pd.merge(self.unique_player_record_df, df, on=["seas_id"], how="left")
+        self.join_engine.add(df, on=["seas_id"])
 
+    @instrumented
     def addTeamSummaries(self):
         file_name = "Team Summaries.csv"
-        df = pd.read_csv(os.path.join(self.raw_data_path, file_name), na_values=na_values, keep_default_na=False)
-        
         # Drop unneccessary columns
-        df = df.drop(["lg","team","age","arena","attend","attend_g"], axis=1)
+        df = self.loader.load(file_name, drop=["lg","team","age","arena","attend","attend_g"])
     
         numerical_cols = df.columns.tolist()
         numerical_cols.remove("season")
         numerical_cols.remove("playoffs")
         numerical_cols.remove("abbreviation")
         
-        df[numerical_cols] = df[numerical_cols].replace("NA", 0)
+        df[numerical_cols] = df[numerical_cols].fillna(0)
         
         df = df.rename(columns={"abbreviation": "tm"})
         
-        self.unique_player_record_df = pd.merge(self.unique_player_record_df, df, on=["season", "tm"], how="left")
-    
-
-    
-if __name__ == "__main__":
-    
-    dp = DataPreprocessor()
-    
\ No newline at end of file
+        self.join_engine.add(df, on=["season", "tm"])
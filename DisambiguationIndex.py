@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+
+class DisambiguationIndex:
+
+    """
+    (name, season) -> player_id for the names used by more than 1 player
+
+    Every season of a career of a same-name player is listed. A season in which only 1 of the players was active
+    gives that player's id, a season in which several were active is marked ambiguous and has no id,
+    e.g. A played in 1990 - 1994 and B in 1994 - 2003: 1990 - 1993 are A, 1995 - 2003 are B and 1994 is ambiguous
+    """
+
+    columns = ["player", "season", "player_id", "ambiguous"]
+
+    def __init__(self, table: pd.DataFrame):
+        self.table = table[self.columns]
+        self.index = self.table.set_index(["player", "season"])
+
+    @classmethod
+    def build(cls, repeated_names: pd.DataFrame, career_info: pd.DataFrame) -> "DisambiguationIndex":
+        """
+        repeated_names has 1 row per (player, player_id) of the shared names, career_info the first_seas and last_seas
+        of every player_id
+        """
+        careers = pd.merge(repeated_names[["player", "player_id"]], career_info[["player_id", "first_seas", "last_seas"]], on="player_id")
+        first_seasons = careers["first_seas"].to_numpy(dtype=np.int64)
+        lengths = np.maximum(careers["last_seas"].to_numpy(dtype=np.int64) - first_seasons + 1, 0)
+
+        # 1 row per season of every career, the season is the first season plus the position within the career
+        starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        seasons_df = pd.DataFrame({
+            "player": np.repeat(careers["player"].to_numpy(), lengths),
+            "season": np.repeat(first_seasons, lengths) + np.arange(lengths.sum()) - starts,
+            "player_id": np.repeat(careers["player_id"].to_numpy(dtype=float), lengths),
+        })
+
+        # number of same-name players active in each season
+        active = seasons_df.groupby(["player", "season"], sort=False)["player_id"].transform("size").to_numpy()
+        seasons_df["ambiguous"] = active > 1
+        seasons_df.loc[seasons_df["ambiguous"], "player_id"] = np.nan
+
+        table = seasons_df.drop_duplicates(subset=["player", "season"]).sort_values(["player", "season"], kind="stable")
+        return cls(table.reset_index(drop=True))
+
+    def lookup(self, names: pd.Series, seasons: pd.Series) -> np.ndarray:
+        """
+        player_id of every (name, season), NaN when ambiguous or not in the index
+        """
+        keys = pd.MultiIndex.from_arrays([names, seasons])
+        return self.index["player_id"].reindex(keys).to_numpy(dtype=float)
+
+    def isAmbiguous(self, names: pd.Series, seasons: pd.Series) -> np.ndarray:
+        keys = pd.MultiIndex.from_arrays([names, seasons])
+        return self.index["ambiguous"].reindex(keys).eq(True).to_numpy()
+
+    def save(self, path: str):
+        self.table.to_csv(path, header=True, index=False)
+
+    @classmethod
+    def load(cls, path: str) -> "DisambiguationIndex":
+        return cls(pd.read_csv(path, keep_default_na=False, na_values=[""], dtype={"player": object}))
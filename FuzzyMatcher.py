@@ -0,0 +1,157 @@
+import hashlib
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from rapidfuzz import process
+from rapidfuzz.distance import Indel
+
+# a candidate can only be accepted when its score is above this value
+MIN_SCORE = 50
+# below this number of comparisons the seasons are scored in-process, starting a pool costs more than the scoring
+POOL_MIN_COMPARISONS = 2_000_000
+
+
+def charCounts(names: list) -> np.ndarray:
+    """
+    Character histogram (1-gram signature) of every name, 1 row per name
+    """
+    codes = sorted(set("".join(names)))
+    lookup = {char: index for index, char in enumerate(codes)}
+    counts = np.zeros((len(names), len(codes)), dtype=np.int32)
+    for row, name in enumerate(names):
+        for char in name:
+            counts[row, lookup[char]] += 1
+    return counts
+
+
+def scoreSeason(season: int, names: list, candidate_names: list, candidate_ids: list) -> tuple:
+    """
+    Score all unmatched salary names of a season against the unconfirmed players of that season
+
+    Returns the season, a dict of name -> (first_id, first_score, second_score, std, count) or None when
+    the name cannot be accepted, and the time spent, number of comparisons and names skipped by the blocking
+    """
+    start = time.perf_counter()
+    # every name starts as not acceptable, in the order given
+    results = dict.fromkeys(names)
+    comparisons, pruned_names = 0, 0
+
+    if len(candidate_names) > 0:
+        counts = charCounts(list(names) + list(candidate_names))
+        name_counts, candidate_counts = counts[:len(names)], counts[len(names):]
+        candidate_lengths = candidate_counts.sum(axis=1)
+
+    scored = list()
+    for index, name in enumerate(names):
+        # Case 0: nothing inside
+        if len(candidate_names) == 0:
+            continue
+
+        # Block the season with the length and character signature of each pair:
+        # the common characters bound the matching characters so no candidate can score above this
+        common = np.minimum(candidate_counts, name_counts[index]).sum(axis=1)
+        upper_bounds = np.rint(200 * common / np.maximum(candidate_lengths + len(name), 1))
+        if upper_bounds.max() <= MIN_SCORE:
+            pruned_names += 1
+            continue
+        scored.append(name)
+
+    if scored:
+        # one-to-many scoring of every name left against every candidate in a single call,
+        # the Indel similarity rounded to a percentage is fuzz.ratio of fuzzywuzzy with python-Levenshtein
+        all_scores = np.rint(100 * process.cdist(scored, candidate_names, scorer=Indel.normalized_similarity, dtype=np.float64))
+        comparisons += all_scores.size
+        for name, scores in zip(scored, all_scores):
+            # stable sort in descending order keeps the first candidate on ties
+            order = np.argsort(-scores, kind="stable")
+            second_score = scores[order[1]] if len(scores) > 1 else None
+            results[name] = (candidate_ids[order[0]], scores[order[0]], second_score, scores.std(), len(scores))
+
+    return season, results, {"seconds": time.perf_counter() - start, "comparisons": comparisons, "pruned_names": pruned_names}
+
+
+class FuzzyMatcher:
+
+    """
+    Fuzzy matching of salary names which could not be matched directly, blocked by season
+    """
+
+    def __init__(self, stat_players: pd.DataFrame, n_jobs: int = None):
+        # 1 candidate per (player, player_id) in each season, in order of appearance
+        stat_players = stat_players.drop_duplicates(subset=["season", "player", "player_id"])
+        self.candidates = {
+            season: (season_df["player"].to_list(), season_df["player_id"].to_list())
+            for season, season_df in stat_players.groupby("season", sort=False)
+        }
+        self.n_jobs = n_jobs
+        # season -> names, candidates, seconds, comparisons and pruned_names of the last score()
+        self.season_stats = dict()
+        # (name, season) -> result of scoreSeason used by the last match()
+        self.scores = dict()
+
+    def poolSignature(self, season: int) -> str:
+        """
+        Hash of the candidates of a season, a score stays valid as long as its pool is the same
+        """
+        candidate_names, candidate_ids = self.candidates.get(season, ([], []))
+        pool = "\n".join(f"{name}\t{player_id}" for name, player_id in zip(candidate_names, candidate_ids))
+        return hashlib.sha1(pool.encode("utf-8")).hexdigest()
+
+    def score(self, need_fuzzy_names: list) -> dict:
+        """
+        Score every (name, season) once, fanning the seasons out over a process pool for large batches
+        """
+        names_by_season = dict()
+        for name, season in need_fuzzy_names:
+            names_by_season.setdefault(season, dict())[name] = None
+
+        tasks = [
+            (season, list(names), *self.candidates.get(season, ([], [])))
+            for season, names in names_by_season.items()
+        ]
+
+        # small batches, e.g. the few names of an incremental run, are not worth a pool
+        comparisons = sum(len(names) * len(candidate_names) for _, names, candidate_names, _ in tasks)
+        if self.n_jobs == 1 or len(tasks) <= 1 or (self.n_jobs is None and comparisons < POOL_MIN_COMPARISONS):
+            outputs = [scoreSeason(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_jobs) as executor:
+                outputs = list(executor.map(scoreSeason, *zip(*tasks))) if tasks else []
+
+        scores = dict()
+        for (season, names, candidate_names, _), (_, results, stats) in zip(tasks, outputs):
+            self.season_stats[season] = {"names": len(names), "candidates": len(candidate_names), **stats}
+            scores.update({(name, season): result for name, result in results.items()})
+        return scores
+
+    def match(self, need_fuzzy_names: list, known_scores: dict = None) -> dict:
+        """
+        Apply the acceptance rule in order of need_fuzzy_names, returns name -> player_id of the accepted matches
+        known_scores are results of a previous run against the same pools, only the other (name, season) are scored
+        """
+        needed = set(need_fuzzy_names)
+        scores = {key: result for key, result in (known_scores or dict()).items() if key in needed}
+        scores.update(self.score([key for key in need_fuzzy_names if key not in scores]))
+        self.scores = scores
+        matched = dict()
+        # avoid duplicated selection of names
+        fuzzy_matched_ids = set()
+
+        for name, season in need_fuzzy_names:
+            result = scores[(name, season)]
+            if result is None:
+                continue
+            first_id, first_score, second_score, std, count = result
+
+            # Case 1: only 1 name
+            if count == 1:
+                if first_score > MIN_SCORE:
+                    matched[name] = first_id
+                    fuzzy_matched_ids.add(first_id)
+            # Case 2: more than 1 name
+            elif first_score > MIN_SCORE and (first_score - second_score) > std and first_id not in fuzzy_matched_ids:
+                matched[name] = first_id
+                fuzzy_matched_ids.add(first_id)
+
+        return matched
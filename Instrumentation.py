@@ -0,0 +1,161 @@
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import pstats
+import threading
+import time
+from datetime import datetime
+
+from util import currentMemoryMB
+
+
+class PeakMemory:
+
+    """
+    Highest resident memory of the process while in the with block, sampled by a background thread
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def __enter__(self):
+        self.peak = currentMemoryMB()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, currentMemoryMB())
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+        self.peak = max(self.peak, currentMemoryMB())
+
+
+def instrumented(method):
+    """
+    Run a method of DataPreprocessor or SalaryStatsMatcher as a stage of its instrumentation
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.instrumentation.stage(method.__name__):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class Instrumentation:
+
+    """
+    Timers, memory snapshots and counters of a run, saved as a JSON run report
+
+    With profile_path every stage also runs under cProfile, its stats are dumped to profile_path/<stage>.prof
+    and the most expensive functions are listed in the report.
+    """
+
+    def __init__(self, profile_path: str = None, top_functions: int = 15):
+        self.profile_path = profile_path
+        self.top_functions = top_functions
+        self.stages = list()
+        self.counters = dict()
+        self.details = dict()
+        self.profiling = False
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        # cProfile cannot be nested, a stage within a profiled stage is only timed
+        profiler = cProfile.Profile() if self.profile_path is not None and not self.profiling else None
+        record = {"name": name, "memory_start_mb": round(currentMemoryMB(), 1)}
+        with PeakMemory() as memory:
+            start = time.perf_counter()
+            if profiler is not None:
+                self.profiling = True
+                profiler.enable()
+            try:
+                yield record
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                    self.profiling = False
+                record["seconds"] = round(time.perf_counter() - start, 4)
+
+        record["memory_end_mb"] = round(currentMemoryMB(), 1)
+        record["peak_mb"] = round(memory.peak, 1)
+        if profiler is not None:
+            record["profile"] = self.saveProfile(name, profiler)
+        self.stages.append(record)
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def countExport(self, name: str, report: dict):
+        """
+        Count the files, bytes and wall-clock milliseconds of a SeasonPartitions.write report per format, e.g. all_stats_csv.gz_bytes
+        """
+        for file_format, stats in report.items():
+            self.count(f"{name}_{file_format}_files", stats["files"])
+            self.count(f"{name}_{file_format}_bytes", stats["bytes"])
+            self.count(f"{name}_{file_format}_ms", round(stats["seconds"] * 1000))
+
+    def exportSummary(self, name: str, formats: list) -> str:
+        return ", ".join(
+            f"{file_format} {self.counters.get(f'{name}_{file_format}_files', 0)} files "
+            f"{self.counters.get(f'{name}_{file_format}_bytes', 0) / (1 << 20):.1f} MB "
+            f"{self.counters.get(f'{name}_{file_format}_ms', 0) / 1000:.2f}s"
+            for file_format in formats
+        )
+
+    def detail(self, name: str, value):
+        # any other JSON serializable information about the run
+        self.details[name] = value
+
+    def saveProfile(self, name: str, profiler: cProfile.Profile) -> dict:
+        os.makedirs(self.profile_path, exist_ok=True)
+        profile_file = os.path.join(self.profile_path, f"{name}.prof")
+        profiler.dump_stats(profile_file)
+
+        # (file, line, function) -> (primitive calls, calls, own time, cumulative time, callers)
+        stats = pstats.Stats(profiler).stats
+        top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top_functions]
+        return {
+            "file": profile_file,
+            "top_functions": [
+                {
+                    "function": f"{os.path.basename(file)}:{line}({function})",
+                    "calls": calls,
+                    "own_seconds": round(own_time, 4),
+                    "cumulative_seconds": round(cumulative_time, 4),
+                }
+                for (file, line, function), (_, calls, own_time, cumulative_time, _) in top
+            ],
+        }
+
+    def getReport(self) -> dict:
+        return {"stages": self.stages, "counters": self.counters, "details": self.details}
+
+    def merge(self, report: dict, **tags):
+        """
+        Add the report of another Instrumentation, e.g. from a worker process, its stages are tagged with tags
+        """
+        self.stages += [{**tags, **stage} for stage in report["stages"]]
+        for name, n in report["counters"].items():
+            self.count(name, n)
+        self.details.update(report["details"])
+
+    def save(self, report_file: str, section: str):
+        """
+        Write the report as section of report_file, the sections written by the other classes are kept
+        """
+        report = dict()
+        if os.path.exists(report_file):
+            with open(report_file) as f:
+                report = json.load(f)
+        report[section] = {"date": datetime.now().isoformat(timespec="seconds"), **self.getReport()}
+
+        with open(report_file + ".tmp", "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        os.replace(report_file + ".tmp", report_file)
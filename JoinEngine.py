@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+class JoinEngine:
+
+    """
+    Left joins side tables onto a base table, assembling the wide result in a single pass
+
+    Only the key columns are merged to resolve which side row belongs to which base row, the rows of each
+    side table are gathered once when it is added and all pieces are concatenated once at the end.
+    Column names, row order and dtypes are the same as chaining pd.merge(how="left") for every table.
+    """
+
+    def __init__(self, base_df: pd.DataFrame):
+        self.base_df = base_df.reset_index(drop=True)
+        # row of the base table for each output row
+        self.base_rows = np.arange(len(self.base_df))
+        self.pieces = list()
+        self.columns = [list(self.base_df.columns)]
+
+    def add(self, df: pd.DataFrame, on: list, fill_value=None):
+        """
+        Left join a table on the given key columns of the base table
+        fill_value replaces the missing values of the table's columns after the join
+        """
+        missing_keys = [key for key in on if key not in self.base_df.columns]
+        if missing_keys:
+            raise KeyError(f"Join keys not in base table: {missing_keys}")
+
+        left = self.base_df[on].iloc[self.base_rows].reset_index(drop=True)
+        left["_left_row"] = np.arange(len(left))
+        right = df[on].reset_index(drop=True)
+        right["_right_row"] = np.arange(len(df))
+        matched = pd.merge(left, right, on=on, how="left")
+
+        # keys repeated in the side table multiply the rows, same as pd.merge
+        if len(matched) != len(left):
+            left_rows = matched["_left_row"].to_numpy()
+            self.base_rows = self.base_rows[left_rows]
+            self.pieces = [piece.iloc[left_rows].reset_index(drop=True) for piece in self.pieces]
+
+        piece = self.takeRows(df.drop(on, axis=1).reset_index(drop=True), matched["_right_row"].fillna(-1).to_numpy(dtype=np.int64))
+        if fill_value is not None:
+            piece = piece.fillna(fill_value)
+        self.pieces.append(piece)
+
+        # suffix overlapping column names the way pd.merge does
+        overlap = set(piece.columns) & set(column for names in self.columns for column in names)
+        self.columns = [[f"{column}_x" if column in overlap else column for column in names] for names in self.columns]
+        self.columns.append([f"{column}_y" if column in overlap else column for column in piece.columns])
+
+    def join(self) -> pd.DataFrame:
+        pieces = [self.takeRows(self.base_df, self.base_rows)] + self.pieces
+        for piece, names in zip(pieces, self.columns):
+            piece.columns = names
+
+        return pd.concat(pieces, axis=1)
+
+    @staticmethod
+    def takeRows(df: pd.DataFrame, rows: np.ndarray) -> pd.DataFrame:
+        """
+        Rows by position, -1 gives a row of NaN
+        """
+        if (rows < 0).any():
+            # reindex upcasts the columns for the missing rows the same way a merge with missing keys does
+            return df.reindex(rows).reset_index(drop=True)
+        return df.iloc[rows].reset_index(drop=True)
+
+
+class TableCollector:
+
+    """
+    Stands in for a JoinEngine to keep the tables added to it instead of joining them
+    """
+
+    def __init__(self):
+        self.tables = list()
+
+    def add(self, df: pd.DataFrame, on: list, fill_value=None):
+        self.tables.append((df, on, fill_value))
@@ -0,0 +1,103 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+from DisambiguationIndex import DisambiguationIndex
+from util import fileFingerprint
+
+# bump when the matching logic changes so old resolutions are not reused
+CACHE_VERSION = 3
+
+score_columns = ["first_id", "first_score", "second_score", "std", "count"]
+
+
+class NameResolutionCache:
+
+    """
+    On-disk cache of the name matching of previous runs
+    - the resolution of every salary record keyed by (normalized name, season), to tell which seasons changed
+    - the fuzzy scores keyed by (normalized name, season) and the pool of candidates they were scored against,
+      a score is reused as long as its pool is the same whatever else changed in the sources
+    - the disambiguation index, rebuilt when Player Season Info or Player Career Info changes
+    """
+
+    def __init__(self, cache_path: str, source_files: list):
+        self.cache_path = cache_path
+        self.metadata_file = os.path.join(cache_path, "metadata.json")
+        self.resolutions_file = os.path.join(cache_path, "name_resolutions.csv")
+        self.scores_file = os.path.join(cache_path, "fuzzy_scores.csv")
+        self.index_file = os.path.join(cache_path, "disambiguation_index.csv")
+
+        self.metadata = {
+            "version": CACHE_VERSION,
+            "sources": {os.path.basename(f): fileFingerprint(f) for f in source_files},
+        }
+        self.valid = self.isValid()
+        self.same_version = self.isSameVersion()
+
+    def loadMetadata(self) -> dict:
+        if not os.path.exists(self.metadata_file):
+            return dict()
+        with open(self.metadata_file) as f:
+            return json.load(f)
+
+    def isValid(self) -> bool:
+        return self.loadMetadata() == self.metadata
+
+    def isSameVersion(self) -> bool:
+        return self.loadMetadata().get("version") == CACHE_VERSION
+
+    def lookup(self, salary_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        player_id and method of every salary record in the previous run, method is NaN for records not seen before
+        """
+        if self.same_version and os.path.exists(self.resolutions_file):
+            resolutions = pd.read_csv(self.resolutions_file, keep_default_na=False, na_values=[""])
+        else:
+            resolutions = pd.DataFrame({
+                "player": pd.Series(dtype=object),
+                "season": pd.Series(dtype="int64"),
+                "player_id": pd.Series(dtype=float),
+                "method": pd.Series(dtype=object),
+            })
+        return pd.merge(salary_df[["player", "season"]], resolutions, on=["player", "season"], how="left")
+
+    def lookupScores(self, pools: dict) -> dict:
+        """
+        (name, season) -> fuzzy score of a previous run, only for the seasons whose pool of candidates is unchanged
+        pools is season -> FuzzyMatcher.poolSignature
+        """
+        if not (self.same_version and os.path.exists(self.scores_file)):
+            return dict()
+        scores = pd.read_csv(self.scores_file, keep_default_na=False, na_values=[""])
+        scores = scores[scores["pool"] == scores["season"].map(pools)]
+        results = [
+            None if count == 0 else (first_id, first_score, None if np.isnan(second_score) else second_score, std, count)
+            for first_id, first_score, second_score, std, count in zip(*(scores[column].to_list() for column in score_columns))
+        ]
+        return dict(zip(zip(scores["player"], scores["season"]), results))
+
+    def loadDisambiguationIndex(self) -> DisambiguationIndex:
+        if self.valid and os.path.exists(self.index_file):
+            return DisambiguationIndex.load(self.index_file)
+        return None
+
+    def save(self, resolutions: pd.DataFrame, scores: dict, pools: dict, disambiguation_index: DisambiguationIndex):
+        os.makedirs(self.cache_path, exist_ok=True)
+        # invalidate first so an interrupted save is never picked up as valid
+        if os.path.exists(self.metadata_file):
+            os.remove(self.metadata_file)
+        resolutions = resolutions[["player", "season", "player_id", "method"]].drop_duplicates(subset=["player", "season"])
+        resolutions.to_csv(self.resolutions_file, header=True, index=False)
+
+        # a name without any candidate to accept is kept with a count of 0
+        rows = [
+            (name, season, pools[season], *(result if result is not None else (None, None, None, None, 0)))
+            for (name, season), result in scores.items()
+        ]
+        pd.DataFrame(rows, columns=["player", "season", "pool", *score_columns]).to_csv(self.scores_file, header=True, index=False)
+
+        disambiguation_index.save(self.index_file)
+        with open(self.metadata_file, "w") as f:
+            json.dump(self.metadata, f, indent=2)
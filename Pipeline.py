@@ -0,0 +1,295 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ColumnarCache import frame_extension, readFrame, writeFrame
+from DataProprocessor import DataPreprocessor
+from Instrumentation import Instrumentation
+from JoinEngine import TableCollector
+from SalaryStatsMatcher import SalaryStatsMatcher
+from SeasonPartitions import export_formats
+from util import fileFingerprint
+
+code_path = os.path.dirname(os.path.abspath(__file__))
+
+
+class Stage:
+
+    """
+    A step of the pipeline with the files it reads and writes
+    parallel=False keeps the stage in the main process, e.g. when it starts its own process pool
+    options changing what the stage writes, the stage runs again when they change
+    by_season marks the stages which only rebuild the given seasons of their outputs in a run with seasons
+    """
+
+    def __init__(self, name: str, run, inputs: list, outputs: list, parallel: bool = True, options: dict = None,
+                 by_season: bool = False):
+        self.name = name
+        self.run = run
+        self.inputs = inputs
+        self.outputs = outputs
+        self.parallel = parallel
+        self.options = options
+        self.by_season = by_season
+
+
+def runStage(raw_data_path: str, data_path: str, seasons: list, chunk_size: int, profile: bool, compact: bool, export_formats: list,
+             name: str) -> tuple:
+    """
+    Run a stage in a worker process, returns the time spent and the instrumentation report of the stage
+    """
+    pipeline = Pipeline(raw_data_path, data_path, seasons, chunk_size, profile, compact, export_formats)
+    start = time.perf_counter()
+    pipeline.stages[name].run()
+    return time.perf_counter() - start, pipeline.instrumentation.getReport()
+
+
+class Pipeline:
+
+    """
+    Builds all_stats.csv and overall_stats_salary.csv stage by stage
+    A stage is skipped when its outputs exist and its inputs, including the code it runs, are unchanged since its last run
+    Independent stages run concurrently in a process pool
+    With seasons only the rows of these seasons are rebuilt and replaced in the outputs, which are kept per season
+    With chunk_size all_stats is joined and written that many seasons at a time to bound memory
+    The steps of every stage are instrumented into ./data/run_report.json, with profile they also run under cProfile
+    With compact all_stats is read as a compact frame and compact copies of the outputs are kept under ./data/cache
+    export_formats adds csv.gz / feather partitions of the outputs under ./data/partitions
+    """
+
+    def __init__(self, raw_data_path: str = "./data/raw_statistics", data_path: str = "./data", seasons: list = None,
+                 chunk_size: int = None, profile: bool = False, compact: bool = False, export_formats: list = ("csv",)):
+        self.raw_data_path = raw_data_path
+        self.data_path = data_path
+        self.seasons = seasons
+        self.chunk_size = chunk_size
+        self.profile = profile
+        self.compact = compact
+        self.export_formats = export_formats
+        self.instrumentation = Instrumentation(os.path.join(data_path, "profiles") if profile else None)
+        self.stage_path = os.path.join(data_path, "cache", "pipeline")
+        self.state_file = os.path.join(self.stage_path, "state.json")
+        self.stages = self.getStages()
+
+    def getStages(self) -> dict:
+        def raw(file_name):
+            return os.path.join(self.raw_data_path, file_name)
+
+        def code(*modules):
+            return [os.path.join(code_path, module) for module in ["util.py", "ColumnarCache.py", "RawDataLoader.py", *modules]]
+
+        def stage_file(name):
+            return os.path.join(self.stage_path, name)
+
+        salaries = os.path.join(self.data_path, "nba_player_salaries.csv")
+        output_options = {"compact": self.compact, "export_formats": sorted(self.export_formats)}
+        all_stats = os.path.join(self.data_path, "all_stats.csv")
+        stages = [
+            Stage(
+                "player_records", self.runPlayerRecords,
+                inputs=[raw("Player Season Info.csv"), salaries] + code("DataProprocessor.py", "SalaryIngestion.py"),
+                outputs=[stage_file("player_records") + frame_extension],
+            )
+        ]
+        for step, file_name in DataPreprocessor.join_steps.items():
+            stages.append(Stage(
+                step, lambda step=step: self.runJoinStep(step),
+                inputs=[raw(file_name)] + code("DataProprocessor.py"),
+                outputs=[stage_file(step) + frame_extension, stage_file(step) + ".json"],
+            ))
+        stages += [
+            Stage(
+                "all_stats", self.runAllStats,
+                inputs=[output for stage in stages for output in stage.outputs]
+                + code("DataProprocessor.py", "JoinEngine.py", "SeasonPartitions.py", "CompactStats.py"),
+                outputs=[all_stats],
+                options=output_options,
+                by_season=True,
+            ),
+            Stage(
+                "name_matching", self.runNameMatching,
+                inputs=[raw("Player Season Info.csv"), raw("Player Career Info.csv"), salaries]
+                + code("SalaryStatsMatcher.py", "FuzzyMatcher.py", "NameResolutionCache.py", "DisambiguationIndex.py", "SalaryIngestion.py"),
+                outputs=[stage_file("matched_salaries") + frame_extension, stage_file("matched_salaries.json")],
+                parallel=False,
+                by_season=True,
+            ),
+            Stage(
+                "salary_merge", self.runSalaryMerge,
+                inputs=[all_stats, stage_file("matched_salaries") + frame_extension, stage_file("matched_salaries.json")]
+                + code("SalaryStatsMatcher.py", "SeasonPartitions.py", "CompactStats.py"),
+                outputs=[os.path.join(self.data_path, "overall_stats_salary.csv")],
+                options=output_options,
+                by_season=True,
+            ),
+        ]
+        return {stage.name: stage for stage in stages}
+
+    def runPlayerRecords(self):
+        preprocessor = DataPreprocessor(self.raw_data_path, self.data_path, run=False, instrumentation=self.instrumentation)
+        writeFrame(preprocessor.getSalaryYearsPlayerRecord(), os.path.join(self.stage_path, "player_records"))
+
+    def runJoinStep(self, step: str):
+        preprocessor = DataPreprocessor(self.raw_data_path, self.data_path, run=False, instrumentation=self.instrumentation)
+        preprocessor.join_engine = TableCollector()
+        getattr(preprocessor, step)()
+
+        df, on, fill_value = preprocessor.join_engine.tables[0]
+        writeFrame(df, os.path.join(self.stage_path, step))
+        with open(os.path.join(self.stage_path, step + ".json"), "w") as f:
+            json.dump({"on": on, "fill_value": fill_value}, f)
+
+    def runAllStats(self):
+        preprocessor = DataPreprocessor(
+            self.raw_data_path, self.data_path, run=False, seasons=self.seasons, chunk_size=self.chunk_size,
+            instrumentation=self.instrumentation, compact=self.compact, export_formats=self.export_formats,
+        )
+        player_df = readFrame(os.path.join(self.stage_path, "player_records"))
+        if self.chunk_size is not None:
+            preprocessor.runChunks(player_df, list(self.loadSideTables()))
+            return
+
+        with self.instrumentation.stage("join"):
+            preprocessor.unique_player_record_df = preprocessor.joinTables(preprocessor.selectSeasons(player_df), self.loadSideTables())
+            if not preprocessor.canUpsert(preprocessor.unique_player_record_df):
+                print("all_stats.csv columns changed, rebuilding every season")
+                preprocessor.unique_player_record_df = preprocessor.joinTables(player_df, self.loadSideTables())
+        preprocessor.saveAllStats()
+
+    def loadSideTables(self):
+        # read 1 by 1 as the join goes so a table can be freed once joined
+        for step in DataPreprocessor.join_steps:
+            with open(os.path.join(self.stage_path, step + ".json")) as f:
+                join = json.load(f)
+            yield readFrame(os.path.join(self.stage_path, step)), join["on"], join["fill_value"]
+
+    def runNameMatching(self):
+        matcher = SalaryStatsMatcher(
+            raw_data_path=self.raw_data_path, data_path=self.data_path, run=False, seasons=self.seasons,
+            instrumentation=self.instrumentation,
+        )
+        matcher.loadSalaries()
+        matcher.nameMatching()
+        writeFrame(matcher.salary_df, os.path.join(self.stage_path, "matched_salaries"))
+        with open(os.path.join(self.stage_path, "matched_salaries.json"), "w") as f:
+            json.dump({"changed_seasons": matcher.changed_seasons}, f)
+
+    def runSalaryMerge(self):
+        matcher = SalaryStatsMatcher(
+            raw_data_path=self.raw_data_path, data_path=self.data_path, run=False, seasons=self.seasons,
+            instrumentation=self.instrumentation, compact=self.compact, export_formats=self.export_formats,
+        )
+        matcher.salary_df = readFrame(os.path.join(self.stage_path, "matched_salaries"))
+        with open(os.path.join(self.stage_path, "matched_salaries.json")) as f:
+            matcher.changed_seasons = json.load(f)["changed_seasons"]
+        matcher.mergeSalaries()
+
+    def getWaves(self, names: list) -> list:
+        """
+        Group the stages so every stage comes after the stages producing its inputs
+        """
+        producers = {output: stage.name for stage in self.stages.values() for output in stage.outputs}
+        dependencies = {
+            name: {producers[path] for path in self.stages[name].inputs if path in producers and producers[path] in names}
+            for name in names
+        }
+        waves, done = list(), set()
+        while len(done) < len(names):
+            wave = [name for name in names if name not in done and dependencies[name] <= done]
+            waves.append(wave)
+            done.update(wave)
+        return waves
+
+    def loadState(self) -> dict:
+        if not os.path.exists(self.state_file):
+            return dict()
+        with open(self.state_file) as f:
+            return json.load(f)
+
+    def saveState(self, state: dict):
+        os.makedirs(self.stage_path, exist_ok=True)
+        with open(self.state_file, "w") as f:
+            json.dump(state, f, indent=2)
+
+    def recordState(self, state: dict, name: str, fingerprint: dict):
+        """
+        Record the inputs a stage was run on
+        A run limited to some seasons leaves the other seasons of a by_season stage as they were, whatever their
+        inputs, so the stage is forgotten instead and the next run without seasons rebuilds it whole
+        """
+        if self.seasons is None or not self.stages[name].by_season:
+            state[name] = fingerprint
+        else:
+            state.pop(name, None)
+        self.saveState(state)
+
+    def fingerprintInputs(self, stage: Stage) -> dict:
+        fingerprints = {path: fileFingerprint(path) for path in stage.inputs}
+        if stage.options is not None:
+            fingerprints["options"] = stage.options
+        return fingerprints
+
+    def run(self, only: list = None, force: bool = False, jobs: int = None):
+        os.makedirs(self.stage_path, exist_ok=True)
+        state = self.loadState()
+        # the stages run in other processes, their reports are gathered here
+        run_report = Instrumentation()
+
+        for wave in self.getWaves(only or list(self.stages)):
+            fingerprints = {name: self.fingerprintInputs(self.stages[name]) for name in wave}
+            to_run = list()
+            for name in wave:
+                outputs_exist = all(os.path.exists(output) for output in self.stages[name].outputs)
+                if force or not outputs_exist or state.get(name) != fingerprints[name]:
+                    to_run.append(name)
+                else:
+                    print(f"{name}: skipped, inputs unchanged")
+                    run_report.count("skipped_stages")
+
+            pooled = [name for name in to_run if self.stages[name].parallel]
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = {executor.submit(runStage, self.raw_data_path, self.data_path, self.seasons, self.chunk_size, self.profile, self.compact, self.export_formats, name): name for name in pooled}
+                # stages which cannot go to the pool run here meanwhile
+                for name in to_run:
+                    if name not in pooled:
+                        elapsed, report = runStage(self.raw_data_path, self.data_path, self.seasons, self.chunk_size, self.profile, self.compact, self.export_formats, name)
+                        print(f"{name}: done in {elapsed:.2f}s")
+                        run_report.merge(report, pipeline_stage=name)
+                        self.recordState(state, name, fingerprints[name])
+                for future in as_completed(futures):
+                    name = futures[future]
+                    elapsed, report = future.result()
+                    print(f"{name}: done in {elapsed:.2f}s")
+                    run_report.merge(report, pipeline_stage=name)
+                    self.recordState(state, name, fingerprints[name])
+
+        run_report.save(os.path.join(self.data_path, "run_report.json"), "Pipeline")
+
+
+def main(argv: list = None):
+    stage_names = list(Pipeline().stages)
+    parser = argparse.ArgumentParser(description="Build all_stats.csv and overall_stats_salary.csv, rerunning only the stages whose inputs changed")
+    parser.add_argument("--force", action="store_true", help="run the stages even if their inputs are unchanged")
+    parser.add_argument("--only", action="append", choices=stage_names, metavar="STAGE",
+                        help=f"run only this stage, can be repeated. Stages: {', '.join(stage_names)}")
+    parser.add_argument("--jobs", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--raw-data-path", default="./data/raw_statistics")
+    parser.add_argument("--data-path", default="./data")
+    parser.add_argument("--seasons", type=int, nargs="+", metavar="SEASON",
+                        help="rebuild only these seasons, e.g. 2023 for 2023-2024, and replace them in the existing outputs")
+    parser.add_argument("--chunk-size", type=int, default=None, metavar="SEASONS",
+                        help="join and write all_stats this many seasons at a time to bound memory")
+    parser.add_argument("--profile", action="store_true", help="run every step under cProfile, stats are saved in ./data/profiles")
+    parser.add_argument("--compact", action="store_true",
+                        help="read all_stats as a compact frame and keep compact copies of the outputs for the analysis")
+    parser.add_argument("--formats", nargs="+", default=["csv"], choices=list(export_formats),
+                        help="formats of the per season partitions of the outputs, csv is always written")
+    args = parser.parse_args(argv)
+
+    Pipeline(args.raw_data_path, args.data_path, args.seasons, args.chunk_size, args.profile, args.compact, args.formats).run(only=args.only, force=args.force, jobs=args.jobs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import json
+import os
+import pandas as pd
+from collections import defaultdict
+
+from util import na_values
+from ColumnarCache import ColumnarCache
+
+# "NA" is how the raw statistics mark a missing value
+raw_na_values = na_values + ["NA"]
+
+# Dtypes of every column which is not a plain statistic, all remaining columns are read as float64
+# float32 is not used for the statistics as it changes the decimals written to all_stats.csv
+raw_dtypes = {
+    # identifiers
+    "seas_id": "Int32",
+    "player_id": "Int32",
+    "season": "Int16",
+    "birth_year": "Int16",
+    "age": "Int16",
+    "experience": "Int16",
+    "first_seas": "Int16",
+    "last_seas": "Int16",
+    "num_seasons": "Int16",
+    # text
+    "player": object,
+    "pos": object,
+    "position": object,
+    "lg": object,
+    "tm": object,
+    "team": object,
+    "abbreviation": object,
+    "type": object,
+    "number_tm": object,
+    "award": object,
+    "arena": object,
+    # flags
+    "playoffs": "boolean",
+    "replaced": "boolean",
+    "winner": "boolean",
+    "hof": "boolean",
+    # counts
+    "g": "Int16",
+    "gs": "Int16",
+    "mp": "Int32",
+    "w": "Int16",
+    "l": "Int16",
+    "pw": "Int16",
+    "pl": "Int16",
+    "attend": "Int32",
+    "attend_g": "Int32",
+    "pts_won": "Int16",
+    "pts_max": "Int16",
+    "x1st_tm": "Int16",
+    "x2nd_tm": "Int16",
+    "x3rd_tm": "Int16",
+}
+
+# Columns whose dtype differs from raw_dtypes in a specific file
+file_dtypes = {
+    # average age of the roster
+    "Team Summaries.csv": {"age": "float64"},
+    # shared votes count as fractions of a point
+    "Player Award Shares.csv": {"pts_won": "float64"},
+}
+
+
+class RawDataLoader:
+
+    """
+    Reads the raw statistics files with explicit dtypes and missing values parsed as NaN
+    With a cache_path each file is parsed once and later reads only load the requested columns from its columnar copy
+    """
+
+    def __init__(self, raw_data_path: str, cache_path: str = None):
+        self.raw_data_path = raw_data_path
+        self.cache = ColumnarCache(cache_path) if cache_path is not None else None
+
+    def getDtypes(self, file_name: str) -> defaultdict:
+        return defaultdict(lambda: "float64", {**raw_dtypes, **file_dtypes.get(file_name, dict())})
+
+    def load(self, file_name: str, columns: list = None, drop: list = None) -> pd.DataFrame:
+        """
+        Read the given columns of a raw file, or all columns but the dropped ones
+        """
+        path = os.path.join(self.raw_data_path, file_name)
+        if self.cache is None:
+            df = self.parse(path)
+            return df[ColumnarCache.selectColumns(df.columns, columns, drop)]
+
+        options = json.dumps({column: str(dtype) for column, dtype in self.getDtypes(file_name).items()}, sort_keys=True)
+        return self.cache.read(path, self.parse, columns=columns, drop=drop, options=options + str(raw_na_values))
+
+    def parse(self, path: str) -> pd.DataFrame:
+        dtypes = self.getDtypes(os.path.basename(path))
+        # the parser is much faster on float64 than on nullable integers, integers are converted after parsing
+        parse_dtypes = defaultdict(dtypes.default_factory, {
+            column: "float64" if str(dtype).startswith("Int") else dtype for column, dtype in dtypes.items()
+        })
+        df = pd.read_csv(
+            path,
+            dtype=parse_dtypes,
+            na_values=raw_na_values,
+            keep_default_na=False,
+        )
+        return df.astype({column: dtypes[column] for column in df.columns if str(dtypes[column]).startswith("Int")})
@@ -0,0 +1,216 @@
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import lxml  # noqa: F401
+    html_parser = "lxml"
+except ImportError:
+    html_parser = "html.parser"
+
+header = ["Year", "Player Name", "Salary (Unadjusted)", "Salary (Adjusted)"]
+
+
+class RateLimiter:
+
+    """
+    Spaces out requests shared by several threads to at most requests_per_second
+    """
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1 / requests_per_second if requests_per_second else 0
+        self.lock = threading.Lock()
+        self.next_time = 0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+class SalaryFetcher:
+
+    """
+    Scrapes the hoopshype salary pages of every season into nba_player_salaries.csv
+
+    Pages are fetched concurrently through a pooled session and kept under cache_path, past seasons are never
+    fetched again and the current season is revalidated with a conditional request. The current season is cached
+    apart, once over its own season page is fetched.
+    The rows of each season are saved as soon as the season is parsed so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, base_url: str = "https://hoopshype.com/salaries/players/", first_season: int = 1990,
+                 current_season: int = 2023, cache_path: str = "./data/cache/hoopshype",
+                 output_file: str = "./data/nba_player_salaries.csv", max_workers: int = 4,
+                 requests_per_second: float = 2, timeout: float = 30):
+        self.base_url = base_url
+        self.seasons = range(first_season, current_season + 1)
+        self.current_season = current_season
+        self.cache_path = cache_path
+        self.output_file = output_file
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(requests_per_second)
+
+        retry = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def getUrl(self, season: int) -> str:
+        if season == self.current_season:
+            return self.base_url
+        return f"{self.base_url}{season}-{season+1}/"
+
+    def getCacheFile(self, season: int, extension: str) -> str:
+        # the current season comes from another url with no adjusted salary, its files are kept apart so the season
+        # page is still fetched once the season is over
+        current = ".current" if season == self.current_season else ""
+        return os.path.join(self.cache_path, f"{season}-{season+1}{current}{extension}")
+
+    def removeStaleCurrent(self):
+        """
+        Remove the files of a season cached while it was the current one
+        """
+        for file_name in os.listdir(self.cache_path):
+            if ".current." in file_name and not file_name.startswith(f"{self.current_season}-"):
+                os.remove(os.path.join(self.cache_path, file_name))
+
+    def fetchPage(self, season: int) -> str:
+        """
+        HTML of a season from the local cache, the current season is revalidated with ETag / Last-Modified
+        """
+        html_file, headers_file = self.getCacheFile(season, ".html"), self.getCacheFile(season, ".json")
+        request_headers = dict()
+        if os.path.exists(html_file) and os.path.exists(headers_file):
+            if season != self.current_season:
+                with open(html_file, encoding="utf-8") as f:
+                    return f.read()
+            with open(headers_file) as f:
+                cached_headers = json.load(f)
+            if "ETag" in cached_headers:
+                request_headers["If-None-Match"] = cached_headers["ETag"]
+            if "Last-Modified" in cached_headers:
+                request_headers["If-Modified-Since"] = cached_headers["Last-Modified"]
+
+        self.rate_limiter.wait()
+        response = self.session.get(self.getUrl(season), headers=request_headers, timeout=self.timeout)
+        if response.status_code == 304:
+            with open(html_file, encoding="utf-8") as f:
+                return f.read()
+        response.raise_for_status()
+
+        # written to temporary files first, a page cut off mid-write would otherwise be reused for good
+        with open(html_file + ".tmp", "w", encoding="utf-8") as f:
+            f.write(response.text)
+        with open(headers_file + ".tmp", "w") as f:
+            json.dump({key: response.headers[key] for key in ["ETag", "Last-Modified"] if key in response.headers}, f)
+        os.replace(html_file + ".tmp", html_file)
+        os.replace(headers_file + ".tmp", headers_file)
+        return response.text
+
+    def parsePage(self, season: int, html_content: str) -> list:
+        # Parse only the table containing player salaries
+        soup = BeautifulSoup(html_content, html_parser, parse_only=SoupStrainer("table", class_="hh-salaries-ranking-table"))
+        if soup.find("table") is None:
+            # e.g. a layout change or an error page, which must not be saved as a season without salaries
+            raise ValueError(f"{season}-{season+1}: salary table not found in {self.getUrl(season)}")
+
+        # Extract player names and salaries from the table
+        data = []
+        for row in soup.find_all("tr"):
+            cells = row.find_all("td")
+            if len(cells) >= 3:
+                if cells[1].text.strip() != "Player":
+                    player_name = cells[1].text.strip()
+                    salary_unadjusted = cells[2].text.strip()
+
+                    if season == self.current_season:
+                        salary_adjusted = salary_unadjusted
+                    else:
+                        salary_adjusted = cells[3].text.strip()
+
+                    data.append([f"{season}-{season+1}", player_name, salary_unadjusted, salary_adjusted])
+        return data
+
+    def fetchSeason(self, season: int, refresh: bool = False) -> list:
+        """
+        Rows of a season, parsed rows of a previous run are reused unless refresh or the season is the current one
+        """
+        rows_file = self.getCacheFile(season, ".csv")
+        if os.path.exists(rows_file) and not refresh and season != self.current_season:
+            with open(rows_file, newline="", encoding="utf-8") as f:
+                return list(csv.reader(f))
+
+        try:
+            data = self.parsePage(season, self.fetchPage(season))
+        except ValueError:
+            # the page is fetched again next time instead of reading the bad page from the cache
+            for extension in [".html", ".json"]:
+                if os.path.exists(self.getCacheFile(season, extension)):
+                    os.remove(self.getCacheFile(season, extension))
+            raise
+        # a season without rows is fetched again next time rather than cached as empty
+        if data:
+            with open(rows_file + ".tmp", "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerows(data)
+            os.replace(rows_file + ".tmp", rows_file)
+        print(f"{season}-{season+1} : {len(data)} entries")
+        return data
+
+    def run(self, refresh: bool = False) -> int:
+        os.makedirs(self.cache_path, exist_ok=True)
+        self.removeStaleCurrent()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            seasons_data = list(executor.map(lambda season: self.fetchSeason(season, refresh), self.seasons))
+
+        # Write all seasons in order, replacing the previous file only once complete
+        with open(self.output_file + ".tmp", "w", newline="", encoding="utf-8") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(header)
+            for data in seasons_data:
+                writer.writerows(data)
+        os.replace(self.output_file + ".tmp", self.output_file)
+
+        total = sum(len(data) for data in seasons_data)
+        print(f"Data saved successfully to {self.output_file}.")
+        print(f"{total} in total")
+        return total
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Scrape the hoopshype player salaries of every season")
+    parser.add_argument("--refresh", action="store_true", help="parse every season again from the cached or fetched pages")
+    parser.add_argument("--base-url", default="https://hoopshype.com/salaries/players/")
+    parser.add_argument("--first-season", type=int, default=1990)
+    parser.add_argument("--current-season", type=int, default=2023)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests-per-second", type=float, default=2)
+    parser.add_argument("--output-file", default="./data/nba_player_salaries.csv")
+    args = parser.parse_args(argv)
+
+    SalaryFetcher(
+        base_url=args.base_url,
+        first_season=args.first_season,
+        current_season=args.current_season,
+        output_file=args.output_file,
+        max_workers=args.workers,
+        requests_per_second=args.requests_per_second,
+    ).run(refresh=args.refresh)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import pandas as pd
+
+# name suffixes, the salary site often leaves them out, e.g. Kelly Oubre for Kelly Oubre Jr.
+name_suffixes = ["jr", "sr", "ii", "iii", "iv", "v"]
+suffix_pattern = rf"(?<=\S) (?:{'|'.join(name_suffixes)})$"
+
+
+def mapDistinct(values: pd.Series, func) -> pd.Series:
+    """
+    func applied to the distinct values only and spread back to every row, names and years repeat a lot
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return pd.Series(func(pd.Series(uniques, dtype=object)).to_numpy()[codes], index=values.index)
+
+
+def normalizeNames(names: pd.Series) -> pd.Series:
+    """
+    Matching key of every name: lower case ascii without accents or punctuation
+    e.g. "Nenê" -> "nene", "J.J. Redick" -> "jj redick", "Tim Hardaway Jr." -> "tim hardaway jr"
+    """
+    def normalize(uniques: pd.Series) -> pd.Series:
+        keys = uniques.astype(str).str.normalize("NFKD").str.encode("ascii", errors="ignore").str.decode("ascii").str.lower()
+        # periods and apostrophes join the letters around them, any other punctuation separates words
+        return keys.str.replace(r"[.'`]", "", regex=True).str.replace(r"[^a-z0-9]+", " ", regex=True).str.strip()
+
+    return mapDistinct(names, normalize)
+
+
+def stripSuffixes(keys: pd.Series) -> pd.Series:
+    """
+    Normalized names without their Jr. / III suffix, e.g. "tim hardaway jr" -> "tim hardaway"
+    Father and son share the stripped name so it is only a fallback to the full key
+    """
+    return mapDistinct(keys, lambda uniques: uniques.str.replace(suffix_pattern, "", regex=True))
+
+
+def parseSeasons(years: pd.Series) -> pd.Series:
+    # "1990-1991" is season 1990, the format used for season in the raw statistics
+    return mapDistinct(years, lambda uniques: uniques.astype(str).str[:4].astype(int)).astype(int)
+
+
+def parseSalaries(salaries: pd.Series) -> pd.Series:
+    # "$9,982,396" -> 9982396.0, an empty or unreadable salary is NaN
+    return pd.to_numeric(salaries.astype(str).str.replace(",", "", regex=False).str.lstrip("$"), errors="coerce")
+
+
+def readSalaries(csv_path: str) -> pd.DataFrame:
+    """
+    Read nba_player_salaries.csv in the format of all_stats: season, player (the normalized name used for matching),
+    player_name as written on the salary site, salary (adjusted) and salary_unadjusted
+    """
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    return pd.DataFrame({
+        "season": parseSeasons(df["Year"]),
+        "player": normalizeNames(df["Player Name"]),
+        "player_name": df["Player Name"],
+        "salary": parseSalaries(df["Salary (Adjusted)"]),
+        "salary_unadjusted": parseSalaries(df["Salary (Unadjusted)"]),
+    })
@@ -1,159 +1,245 @@
 import pandas as pd
 import os
 import numpy as np
-from fuzzywuzzy import fuzz
+
+from CompactStats import compactFrame, readStats, storeStats
+from DisambiguationIndex import DisambiguationIndex
+from FuzzyMatcher import FuzzyMatcher
+from Instrumentation import Instrumentation, instrumented
+from NameResolutionCache import NameResolutionCache
+from RawDataLoader import RawDataLoader
+from SalaryIngestion import normalizeNames, readSalaries, stripSuffixes
+from SeasonPartitions import SeasonPartitions
 
 class SalaryStatsMatcher:
-    def __init__(self):
-        self.raw_data_path = "./data/raw_statistics"
-        self.data_path = "./data"
+    def __init__(self, use_cache: bool = True, raw_data_path: str = "./data/raw_statistics", data_path: str = "./data", run: bool = True, seasons: list = None,
+                 instrumentation: Instrumentation = None, compact: bool = False, export_formats: list = ("csv",), n_jobs: int = None):
+        self.raw_data_path = raw_data_path
+        self.data_path = data_path
+        # reuse name resolutions from previous runs, stored in ./data/cache
+        self.use_cache = use_cache
+        # shares the columnar copies of the raw files with DataPreprocessor
+        self.loader = RawDataLoader(self.raw_data_path, os.path.join(self.data_path, "cache", "raw_statistics"))
+        # seasons to refresh, None rebuilds every season
+        # changed_seasons adds the seasons whose matches changed because of them and is set by nameMatching
+        self.seasons = seasons
+        self.changed_seasons = None
+        # export_formats adds csv.gz / feather partitions of overall_stats_salary, written by n_jobs threads
+        self.overall_partitions = SeasonPartitions(os.path.join(self.data_path, "overall_stats_salary.csv"), export_formats, n_jobs)
+        # timings, memory and counters of every phase, saved next to overall_stats_salary.csv by run()
+        self.instrumentation = instrumentation or Instrumentation()
+        # read all_stats as a compact frame and keep a compact copy of overall_stats_salary.csv for the analysis
+        # the frame read keeps the statistics in float64 so overall_stats_salary.csv is written without losing digits
+        self.compact = compact
 
-        self.all_stats_df = pd.read_csv(os.path.join(self.data_path,"all_stats.csv"))
-        self.salary_df =pd.read_csv(os.path.join(self.data_path, "nba_player_salaries.csv")) 
+        # run=False only sets up the paths so the steps can be run 1-by-1, e.g. by Pipeline
+        if run:
+            self.run()
 
-        # match format with all_stats_df
-        self.salary_df["season"] = self.salary_df["Year"].apply(lambda x: int(str(x).split("-")[0]))
-        self.salary_df.rename(columns={"Player Name": "player", "Salary (Adjusted)": "salary"}, inplace=True)
-        self.salary_df.drop(["Year","Salary (Unadjusted)"], axis=1, inplace=True)
-        # change back to float instead of str
-        self.salary_df["salary"] = self.salary_df["salary"].apply(lambda x: float(str(x).replace(",","").replace("$","")))
-        
+    def run(self):
+        self.loadSalaries()
         self.nameMatching()
-        # remove player column which is not used as pk
-        self.salary_df.drop(["player"], axis=1, inplace=True)
+        self.mergeSalaries()
+        self.instrumentation.save(os.path.join(self.data_path, "run_report.json"), "SalaryStatsMatcher")
+
+    @instrumented
+    def loadSalaries(self):
+        # match format with all_stats_df, player is the normalized name every matching case uses
+        self.salary_df = readSalaries(os.path.join(self.data_path, "nba_player_salaries.csv"))
+
+    @instrumented
+    def mergeSalaries(self):
+        all_stats_partitions = SeasonPartitions(os.path.join(self.data_path, "all_stats.csv"))
+        seasons = self.changed_seasons
+        if seasons is not None and self.overall_partitions.exists() and all_stats_partitions.exists():
+            # only the seasons whose stats or matches changed are merged again
+            self.all_stats_df = all_stats_partitions.read(seasons)
+            if self.compact:
+                self.all_stats_df = compactFrame(self.all_stats_df, sparse=False, precise=True)
+            final_df = self.mergeStats()
+            if not self.overall_partitions.matches(final_df.columns):
+                print("overall_stats_salary.csv columns changed, rebuilding every season")
+                seasons = None
+        else:
+            seasons = None
         
-        all_stats_df = pd.read_csv(os.path.join(self.data_path, "all_stats.csv"))
-        final_df = pd.merge(all_stats_df, self.salary_df, on=["season", "player_id"], how="left")
-        # drop na salary if as salary is the target
-        final_df = final_df.dropna(subset=["salary"])
+        if seasons is None:
+            if self.compact:
+                self.all_stats_df = readStats(os.path.join(self.data_path, "all_stats.csv"), sparse=False, precise=True)
+            else:
+                self.all_stats_df = pd.read_csv(os.path.join(self.data_path,"all_stats.csv"))
+            final_df = self.mergeStats()
+        
+        export_report = self.overall_partitions.write(final_df, seasons)
+        self.instrumentation.countExport("overall_stats_salary", export_report)
+        self.overall_partitions.combine()
+        print(f"overall_stats_salary partitions: {self.instrumentation.exportSummary('overall_stats_salary', self.overall_partitions.formats)}")
+        if self.compact and seasons is None:
+            storeStats(self.overall_partitions.output_file, final_df)
         
-        final_df.to_csv(os.path.join(self.data_path, "overall_stats_salary.csv"), header=True, index=False)
+    def mergeStats(self) -> pd.DataFrame:
+        # remove player columns which are not used as pk
+        # the unadjusted salary is the same target before inflation, it must not end up in the features
+        salary_df = self.salary_df.drop(["player", "player_name", "salary_unadjusted"], axis=1)
+        
+        final_df = pd.merge(self.all_stats_df, salary_df, on=["season", "player_id"], how="left")
+        # drop na salary if as salary is the target
+        return final_df.dropna(subset=["salary"])
         
     def nameMatching(self):
-        # This is a unique list from original raw data source
-        stat_players = pd.read_csv(os.path.join(self.raw_data_path,"Player Season Info.csv"))
-        stat_players = stat_players[["season", "player_id","player"]]
-        
-        # using only data from 1990 to match salary
-        stat_players = stat_players[stat_players["season"] >= 1990]
-        
-        # standardize name formatting
-        stat_players["player"] = stat_players["player"].apply(lambda x: str(x).strip().lower())
-        self.salary_df["player"] = self.salary_df["player"].apply(lambda x: str(x).strip().lower())
-        
-        repeated_dict = dict()
-        # Filter out players with identical names
-        for name in stat_players["player"].drop_duplicates().to_list():
-            temp_df = stat_players[stat_players["player"]==name]
-            if temp_df["player_id"].nunique() > 1:
-                repeated_dict[name] = temp_df["player_id"].drop_duplicates().to_list()
-        print(len(repeated_dict))
-        print(repeated_dict)
-        
-        ####### Prepare the distinguishing years repeated
-        career_info = pd.read_csv(os.path.join(self.raw_data_path, "Player Career Info.csv"))
-        career_info = career_info[career_info["last_seas"] >= 1990]
-        repeated_players_distinguishing_years = dict()
-        
-        # Loop through the repeated names to collect distinguishing years
-        for player_name, player_ids in repeated_dict.items():
-            temp_dict_id = dict()
-            distinguishing_years = dict()
+        with self.instrumentation.stage("loadStatPlayers"):
+            # This is a unique list from original raw data source
+            stat_players = self.loader.load("Player Season Info.csv", columns=["season", "player_id","player"])
+            stat_players = stat_players.astype({"season": int, "player_id": int})
             
-            for index, player_id in enumerate(player_ids):
-                # filter career info to this person
-                temp_df = career_info[career_info["player_id"]==player_id]
-                # Set career time as range
-                first_seas = temp_df["first_seas"].values[0]
-                last_seas = temp_df["last_seas"].values[0]
-                if index == 0:
-                    min_year = first_seas
-                    max_year = last_seas = last_seas
-                else:
-                    min_year = first_seas if first_seas < min_year else min_year
-                    max_year = last_seas if last_seas > max_year else max_year
-                    
-                temp_dict_id[player_id] = range(first_seas, last_seas+1)
-
-                # Now that all years player played in are collected, select distinguishing years for each person
-                distinguishing_years[player_id] = list()
+            # using only data from 1990 to match salary
+            stat_players = stat_players[stat_players["season"] >= 1990]
+            
+            # standardize name formatting the same way as the salary names
+            stat_players["player"] = normalizeNames(stat_players["player"])
             
-            # From min year to max year, check if the year only exists in one of the ranges
-            for year in range(min_year, max_year+1):
-                matching_ids = list()
-                for player_id in player_ids:
-                    if year in temp_dict_id[player_id]:
-                        matching_ids += [player_id]
-                # Add year record if that year has only 1 person with repeated name playing
-                if len(matching_ids) == 1:
-                    distinguishing_years[matching_ids[0]] += [year]
-            repeated_players_distinguishing_years[player_name] = distinguishing_years
+            repeated_names = self.getRepeatedNames(stat_players)
+        self.instrumentation.count("repeated_names", repeated_names["player"].nunique())
+        
+        # Fuzzy scores of previous runs are reused for the seasons whose candidates are unchanged
+        cache = None
+        if self.use_cache:
+            with self.instrumentation.stage("cacheLookup"):
+                cache = NameResolutionCache(
+                    os.path.join(self.data_path, "cache"),
+                    [os.path.join(self.raw_data_path, "Player Season Info.csv"), os.path.join(self.raw_data_path, "Player Career Info.csv")]
+                )
+                previous = cache.lookup(self.salary_df)
+                disambiguation_index = cache.loadDisambiguationIndex()
+        else:
+            previous = pd.DataFrame({"player_id": np.nan, "method": np.nan}, index=self.salary_df.index)
+            disambiguation_index = None
+        
+        ####### Index of the seasons telling the players of a repeated name apart, built once while the sources are unchanged
+        if disambiguation_index is None:
+            career_info = self.loader.load("Player Career Info.csv", columns=["player_id", "first_seas", "last_seas"]).astype(int)
+            career_info = career_info[career_info["last_seas"] >= 1990]
+            disambiguation_index = self.buildDisambiguationIndex(repeated_names, career_info)
+        
+        # Repeated and direct names are resolved for every record, both are vectorized lookups
+        is_repeated = self.salary_df["player"].isin(repeated_names["player"]).to_numpy()
+        repeated_ids = self.matchRepeatedNames(disambiguation_index)
+        direct_ids = self.matchDirectNames(stat_players, repeated_names)
         
         # Initialize player_id column for filling if found
-        self.salary_df["player_id"] = np.nan
-        need_fuzzy_names = list()
-        confirmed_ids = list()
+        self.salary_df["player_id"] = np.where(is_repeated, repeated_ids, direct_ids)
+        methods = pd.Series(np.where(self.salary_df["player_id"].isna(), None, np.where(is_repeated, "repeated", "direct")), index=self.salary_df.index)
+        confirmed_ids = self.salary_df.loc[methods.notna(), "player_id"].unique()
         
-        for i, row in self.salary_df.iterrows():
-            salary_name, salary_season = row["player"], row["season"]
-            
-            # Case 1: duplicated names
-            if salary_name in repeated_dict.keys():
-                # logic is to check the years their playing time can be distinguished, e.g. A played in 1990 - 1994 and B played in 1994 - 2003
-                # The distinguishing years are 1990 - 1993 and 1995 - 2023
-                
-                for id, years in repeated_players_distinguishing_years[salary_name].items():
-                    if salary_season in years:
-                        self.salary_df.at[i, "player_id"] = id
-                        confirmed_ids = confirmed_ids + [id] if id not in confirmed_ids else confirmed_ids
-                        break
-            
-            # Case 2: direct match
-            elif salary_name in stat_players["player"].values:
-                id = stat_players[stat_players["player"] == salary_name]["player_id"].values[0]
-                self.salary_df.at[i, "player_id"] = id
-                confirmed_ids = confirmed_ids + [id] if id not in confirmed_ids else confirmed_ids
-            
-            # Case 3: no direct match - saved for fuzzy matching
-            else:
-                need_fuzzy_names += [(salary_name, salary_season)]
+        # Case 3: no direct match - saved for fuzzy matching
+        need_fuzzy = self.salary_df[~is_repeated & self.salary_df["player_id"].isna()]
+        need_fuzzy_names = list(zip(need_fuzzy["player"], need_fuzzy["season"]))
         
-        # Performing fuzzy matching for remaining results
+        # Performing fuzzy matching for remaining results, the acceptance rule always runs over every name
+        # so a cached score gives the same matches as a full recompute
+        fuzzy_matched = self.matchFuzzyNames(stat_players, need_fuzzy_names, confirmed_ids, cache)
+        
+        # a fuzzy match is applied to every salary record with that name
+        fuzzy_ids = self.salary_df["player"].map(fuzzy_matched)
+        self.salary_df.loc[fuzzy_ids.notna(), "player_id"] = fuzzy_ids
+        methods[fuzzy_ids.notna()] = "fuzzy"
+        methods[methods.isna()] = "unmatched"
+        
+        # resolutions of every salary record by case
+        method_counts = methods.value_counts()
+        for method, counter in [("direct", "exact"), ("repeated", "duplicate"), ("fuzzy", "fuzzy"), ("unmatched", "unmatched")]:
+            self.instrumentation.count(f"{counter}_resolutions", method_counts.get(method, 0))
+        
+        if self.seasons is not None:
+            # the seasons asked for and those whose records changed id, e.g. a name fuzzy matched in a new season
+            is_new = previous["method"].isna().to_numpy()
+            previous_ids = previous["player_id"].to_numpy(dtype=float)
+            ids = self.salary_df["player_id"].to_numpy(dtype=float)
+            changed = is_new | ~((previous_ids == ids) | (np.isnan(previous_ids) & np.isnan(ids)))
+            self.changed_seasons = sorted(set(self.seasons) | set(self.salary_df.loc[changed, "season"].astype(int)))
+        
+        if self.use_cache:
+            with self.instrumentation.stage("cacheSave"):
+                cache.save(
+                    self.salary_df[["player", "season", "player_id"]].assign(method=methods),
+                    self.fuzzy_scores, self.fuzzy_pools, disambiguation_index
+                )
+        
+    @instrumented
+    def matchRepeatedNames(self, disambiguation_index: DisambiguationIndex) -> np.ndarray:
+        """
+        Case 1: duplicated names, player_id of every salary record or NaN
+        logic is to check the years their playing time can be distinguished, e.g. A played in 1990 - 1994 and B played in 1994 - 2003
+        The distinguishing years are 1990 - 1993 and 1995 - 2023, 1994 is ambiguous
+        """
+        names, seasons = self.salary_df["player"], self.salary_df["season"]
+        self.instrumentation.count("ambiguous_records", disambiguation_index.isAmbiguous(names, seasons).sum())
+        
+        return disambiguation_index.lookup(names, seasons)
+    
+    @instrumented
+    def matchDirectNames(self, stat_players: pd.DataFrame, repeated_names: pd.DataFrame) -> np.ndarray:
+        """
+        Case 2: direct match on the names used by a single player, player_id of every salary record or NaN
+        """
+        # Index name -> player_id
+        unique_players = stat_players[~stat_players["player"].isin(repeated_names["player"])]
+        direct_index = unique_players.drop_duplicates(subset=["player"]).set_index("player")["player_id"]
+        direct_ids = self.salary_df["player"].map(direct_index).to_numpy(dtype=float)
+        
+        # names written with or without Jr. / III on 1 side only, matched on the name without suffix if a single player uses it
+        # and the salary season is within 2 seasons of his stat seasons, a rookie can be paid through an injury or G League
+        # seasons before his first game, but "Scottie Pippen Jr" in 2022 is not his father who played until 2004
+        base_players = stat_players[["player", "player_id"]].assign(player=stripSuffixes(stat_players["player"]), season=stat_players["season"])
+        base_careers = base_players.groupby("player").agg(
+            player_id=("player_id", "first"), ids=("player_id", "nunique"), first_seas=("season", "min"), last_seas=("season", "max")
+        )
+        base_careers = base_careers[base_careers["ids"] == 1]
+        missing = np.isnan(direct_ids)
+        careers = base_careers.reindex(stripSuffixes(self.salary_df.loc[missing, "player"]))
+        seasons = self.salary_df.loc[missing, "season"].to_numpy()
+        in_career = (careers["first_seas"].to_numpy() - 2 <= seasons) & (seasons <= careers["last_seas"].to_numpy() + 2)
+        direct_ids[missing] = np.where(in_career, careers["player_id"].to_numpy(dtype=float), np.nan)
+        self.instrumentation.count("suffix_matches", (missing & ~np.isnan(direct_ids)).sum())
+        
+        return direct_ids
+    
+    @instrumented
+    def matchFuzzyNames(self, stat_players: pd.DataFrame, need_fuzzy_names: list, confirmed_ids, cache: NameResolutionCache = None) -> dict:
+        """
+        Case 3: fuzzy match of the (name, season) left against the players not matched already, returns name -> player_id
+        Only the (name, season) without a cached score against the same candidates are scored
+        """
         not_confirmed_stat_player = stat_players[~stat_players["player_id"].isin(confirmed_ids)]
-        # avoid duplicated selection of names
-        fuzzy_matched_ids = list()
-            
-        for name, season in need_fuzzy_names:
-            scores = dict()
-            # Filter to that season
-            temp_not_confirmed_stat_player = not_confirmed_stat_player[not_confirmed_stat_player["season"]==season]
-            
-            for i, row in temp_not_confirmed_stat_player.iterrows():
-                # performing fuzzy matching for all unconfirmed names
-                fuzz_score = fuzz.ratio(name, row["player"])
-                scores[(row["player"], row["player_id"])] = fuzz_score
-            
-            # sort in descending order to show player with highest score
-            scores = dict(sorted(scores.items(), key=lambda x: x[1], reverse=True))
-            
-            # set logic to check if the result is accepted
-            
-            np_scores = np.array(list(scores.values()))
-            first_id = list(scores.keys())[0][1]
-            # Case 0: nothing inside
-            if np_scores.size == 0:
-                pass
-            # Case 1: only 1 name
-            elif len(np_scores) == 1:
-                print(np_scores)
-                if np_scores[0] > 50:
-                    self.salary_df.loc[self.salary_df['player'] == name, "player_id"] = first_id
-                    fuzzy_matched_ids += [first_id]
-            # Case 2: more than 1 name
-            elif len(np_scores) > 1: 
-                if np_scores[0] > 50 and (np_scores[0] - np_scores[1]) > np_scores.std() and first_id not in fuzzy_matched_ids:
-                    self.salary_df.loc[self.salary_df['player'] == name, "player_id"] = first_id
-                    fuzzy_matched_ids += [first_id]
-        
-if __name__ == "__main__":
-    SSM = SalaryStatsMatcher()
\ No newline at end of file
+        fuzzy_matcher = FuzzyMatcher(not_confirmed_stat_player)
+        self.fuzzy_pools = {season: fuzzy_matcher.poolSignature(season) for season in {season for _, season in need_fuzzy_names}}
+        known_scores = cache.lookupScores(self.fuzzy_pools) if cache is not None else dict()
+        fuzzy_matched = fuzzy_matcher.match(need_fuzzy_names, known_scores)
+        self.fuzzy_scores = fuzzy_matcher.scores
+        
+        season_stats = fuzzy_matcher.season_stats
+        self.instrumentation.count("fuzzy_names", len(need_fuzzy_names))
+        self.instrumentation.count("cached_fuzzy_scores", len(set(need_fuzzy_names) & known_scores.keys()))
+        self.instrumentation.count("fuzzy_comparisons", sum(stats["comparisons"] for stats in season_stats.values()))
+        self.instrumentation.count("fuzzy_pruned_names", sum(stats["pruned_names"] for stats in season_stats.values()))
+        self.instrumentation.detail("fuzzy_seasons", {int(season): stats for season, stats in sorted(season_stats.items())})
+        
+        return fuzzy_matched
+    
+    def getRepeatedNames(self, stat_players: pd.DataFrame) -> pd.DataFrame:
+        """
+        Names shared by more than 1 player_id, 1 row per (player, player_id)
+        """
+        name_ids = stat_players[["player", "player_id"]].drop_duplicates()
+        
+        return name_ids[name_ids["player"].duplicated(keep=False)]
+    
+    @instrumented
+    def buildDisambiguationIndex(self, repeated_names: pd.DataFrame, career_info: pd.DataFrame) -> DisambiguationIndex:
+        """
+        For every duplicated name, the seasons in which only 1 of the players was active and those in which several were
+        """
+        disambiguation_index = DisambiguationIndex.build(repeated_names, career_info)
+        self.instrumentation.count("ambiguous_seasons", disambiguation_index.table["ambiguous"].sum())
+        
+        return disambiguation_index
@@ -0,0 +1,302 @@
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+# file extension of every export format, csv is always written as the other files are derived from it
+export_formats = {"csv": ".csv", "csv.gz": ".csv.gz", "feather": ".feather"}
+
+
+def writeFile(path: str, data: bytes) -> int:
+    """
+    Write a partition to a temporary file renamed once complete, returns its size
+    """
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+    return len(data)
+
+
+def writeFeather(path: str, df: pd.DataFrame) -> int:
+    feather.write_feather(df.reset_index(drop=True), path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return os.path.getsize(path)
+
+
+# kind of every text value as read_csv would parse it
+bool_texts = ["True", "TRUE", "true", "False", "FALSE", "false"]
+int_pattern = r"[+-]?\d+"
+text_kinds = ["bool", "int64", "float64", "object"]
+float_pattern = r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?|[+-]?(?:inf|Inf|INF)"
+
+
+def inferDtypes(df: pd.DataFrame, seasons: pd.Series) -> dict:
+    """
+    season -> dtypes read_csv infers from the csv of that season's rows, worked out from the frame without formatting it
+    A column without any value is float, a missing value turns int into float and bool into object,
+    text columns are int, float or bool when all their values read as such
+    """
+    is_na = df.isna().groupby(seasons)
+    any_na, all_na = is_na.any(), is_na.all()
+    season_codes = pd.Categorical(seasons, categories=any_na.index).codes
+
+    kinds = dict()
+    for column, values in df.items():
+        if pd.api.types.is_bool_dtype(values.dtype):
+            kinds[column] = "bool"
+        elif pd.api.types.is_integer_dtype(values.dtype):
+            kinds[column] = "int64"
+        elif pd.api.types.is_float_dtype(values.dtype):
+            kinds[column] = "float64"
+        else:
+            # the text of every distinct value classified once, then the kinds present in each season
+            codes, uniques = pd.factorize(values)
+            texts = pd.Series(uniques, dtype=object).astype(str)
+            unique_kinds = np.select(
+                [texts.isin(bool_texts), texts.str.fullmatch(int_pattern), texts.str.fullmatch(float_pattern)], [0, 1, 2], 3,
+            )
+            present = np.zeros((len(any_na.index), len(text_kinds)), dtype=bool)
+            present[season_codes[codes >= 0], unique_kinds[codes[codes >= 0]]] = True
+            kinds[column] = [textDtype({text_kinds[kind] for kind in np.flatnonzero(row)}) for row in present]
+
+    dtypes = pd.DataFrame(kinds, index=any_na.index)
+    dtypes = dtypes.mask(any_na & (dtypes == "int64"), "float64").mask(any_na & (dtypes == "bool"), "object")
+    dtypes = dtypes.mask(all_na, "float64")
+    return {int(season): row.to_dict() for season, row in dtypes.iterrows()}
+
+
+def textDtype(kinds: set) -> str:
+    if kinds == {"bool"}:
+        return "bool"
+    if kinds and kinds <= {"int64"}:
+        return "int64"
+    if kinds and kinds <= {"int64", "float64"}:
+        return "float64"
+    return "object"
+
+
+def parseDtypes(text: bytes) -> dict:
+    return {column: str(dtype) for column, dtype in pd.read_csv(io.BytesIO(text)).dtypes.items()}
+
+
+def combineDtypes(season_dtypes: list) -> dict:
+    """
+    Dtype read_csv infers for every column of the combined file from the dtypes it infers for each season:
+    int and float seasons give float, any other mix gives object
+    """
+    dtypes = dict()
+    for column in season_dtypes[0]:
+        kinds = {season[column] for season in season_dtypes}
+        if len(kinds) == 1:
+            dtypes[column] = kinds.pop()
+        elif kinds <= {"int64", "float64"}:
+            dtypes[column] = "float64"
+        else:
+            dtypes[column] = "object"
+    return dtypes
+
+
+def readSeasonFile(path: str) -> dict:
+    if not os.path.exists(path):
+        return dict()
+    with open(path) as f:
+        return {int(season): value for season, value in json.load(f).items()}
+
+
+def saveSeasonFile(path: str, values: dict):
+    with open(path + ".tmp", "w") as f:
+        json.dump({str(season): value for season, value in sorted(values.items())}, f)
+    os.replace(path + ".tmp", path)
+
+
+class SeasonPartitions:
+
+    """
+    Seasons are replaced independently, a season with the same rows as the last write is skipped, and the combined file is
+    rebuilt by concatenating the partitions in season order
+    Seasons are replaced independently and the combined file is rebuilt by concatenating the partitions in season order
+    formats adds a gzipped csv (season=1990.csv.gz) or feather (season=1990.feather) copy of every partition for the
+    readers which do not need to parse the csv. With several formats the seasons are written by n_jobs threads, gzip and
+    arrow release the GIL and the threads share the frame instead of receiving a pickled copy of every season
+    """
+
+    def __init__(self, output_file: str, formats: list = ("csv",), n_jobs: int = None):
+        self.output_file = output_file
+        name = os.path.splitext(os.path.basename(output_file))[0]
+        self.partition_path = os.path.join(os.path.dirname(output_file), "partitions", name)
+        # season -> dtypes inferred from its csv partition, so some seasons can be read as they are in the combined file
+        self.schema_file = os.path.join(self.partition_path, "schema.json")
+        # season -> hash of the rows its partitions were written from, a season with the same rows is not written again
+        self.hashes_file = os.path.join(self.partition_path, "hashes.json")
+        unknown = [file_format for file_format in formats if file_format not in export_formats]
+        if unknown:
+            raise ValueError(f"Unknown export formats {unknown}, expected some of {list(export_formats)}")
+        if "feather" in formats and feather is None:
+            raise ImportError("pyarrow is required to export feather partitions")
+        self.formats = ["csv"] + [file_format for file_format in formats if file_format != "csv"]
+        # csv alone is written in-process, the formatting holds the GIL so threads would not help
+        self.n_jobs = n_jobs if n_jobs is not None else (os.cpu_count() if len(self.formats) > 1 else 1)
+
+    def getFile(self, season: int, file_format: str = "csv") -> str:
+        return os.path.join(self.partition_path, f"season={int(season)}{export_formats[file_format]}")
+
+    def getSeasons(self) -> list:
+        if not os.path.isdir(self.partition_path):
+            return list()
+        return sorted(
+            int(file_name[len("season="):-len(".csv")]) for file_name in os.listdir(self.partition_path)
+            if file_name.startswith("season=") and file_name.endswith(".csv")
+        )
+
+    def exists(self) -> bool:
+        return len(self.getSeasons()) > 0
+
+    def getHeader(self) -> list:
+        """
+        Columns of the stored partitions, None when there are none
+        """
+        seasons = self.getSeasons()
+        if not seasons:
+            return None
+        with open(self.getFile(seasons[0]), newline="") as f:
+            return next(csv.reader(f))
+
+    def matches(self, columns) -> bool:
+        """
+        Whether a frame with these columns can replace some seasons without touching the others
+        """
+        header = self.getHeader()
+        return header is None or header == [str(column) for column in columns]
+
+    def loadSchema(self) -> dict:
+        """
+        season -> inferred dtypes of every stored partition, partitions of an older run without them are parsed once
+        """
+        schema = self.readSchemaFile()
+        seasons = self.getSeasons()
+        missing = [season for season in seasons if season not in schema]
+        for season in missing:
+            with open(self.getFile(season), "rb") as f:
+                schema[season] = parseDtypes(f.read())
+        schema = {season: schema[season] for season in seasons}
+        if missing:
+            self.saveSchema(schema)
+        return schema
+
+    def readSchemaFile(self) -> dict:
+        return readSeasonFile(self.schema_file)
+
+    def saveSchema(self, schema: dict):
+        saveSeasonFile(self.schema_file, schema)
+
+    def hashSeasons(self, df: pd.DataFrame, season_rows: dict) -> dict:
+        """
+        season -> hash of its rows, columns and dtypes, anything changing the csv of the season changes its hash
+        """
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        columns = json.dumps([[str(column), str(dtype)] for column, dtype in df.dtypes.items()]).encode("utf-8")
+        return {int(season): hashlib.sha1(columns + row_hashes[rows].tobytes()).hexdigest() for season, rows in season_rows.items()}
+
+    def read(self, seasons: list) -> pd.DataFrame:
+        """
+        Rows of the given seasons with the dtypes of the combined file, e.g. float for a column with NaN in another season
+        """
+        dtypes = combineDtypes(list(self.loadSchema().values()))
+        files = [self.getFile(season) for season in seasons if os.path.exists(self.getFile(season))]
+        if not files:
+            return pd.read_csv(self.getFile(self.getSeasons()[0]), nrows=0).astype(dtypes)
+        return pd.concat([pd.read_csv(f, dtype=dtypes) for f in files], ignore_index=True)
+
+    def write(self, df: pd.DataFrame, seasons: list = None) -> dict:
+        """
+        Replace the partitions of every season in df, in every format
+        The partitions of the given seasons without rows in df are removed, or of every season not in df when seasons is None
+        A season whose partitions were written from the same rows in every format is left as it is
+        Returns the files, bytes and wall-clock seconds spent writing them per format
+        """
+        os.makedirs(self.partition_path, exist_ok=True)
+        season_rows = df.groupby("season", sort=True).indices
+        hashes = self.hashSeasons(df, season_rows)
+        stored_hashes = readSeasonFile(self.hashes_file)
+        changed = [
+            season for season in season_rows
+            if stored_hashes.get(int(season)) != hashes[int(season)]
+            or not all(os.path.exists(self.getFile(season, file_format)) for file_format in self.formats)
+        ]
+        # the hashes of the seasons about to be rewritten are dropped first, an interrupted write is then redone
+        saveSeasonFile(self.hashes_file, {season: value for season, value in stored_hashes.items() if season not in hashes})
+        frames = [df.iloc[season_rows[season]] for season in changed]
+
+        executor = ThreadPoolExecutor(max_workers=self.n_jobs) if self.n_jobs != 1 and len(frames) > 1 else None
+        mapSeasons = executor.map if executor is not None else map
+        report = dict()
+        try:
+            # 1 format at a time so the time of each format is its own wall-clock time
+            for file_format in self.formats:
+                start = time.perf_counter()
+                files = [self.getFile(season, file_format) for season in changed]
+                if file_format == "csv":
+                    texts = list(mapSeasons(lambda frame: frame.to_csv(header=True, index=False).encode("utf-8"), frames))
+                    sizes = list(mapSeasons(writeFile, files, texts))
+                elif file_format == "csv.gz":
+                    # level 1 costs little more than the plain csv, mtime 0 so the same rows always give the same bytes
+                    sizes = list(mapSeasons(lambda path, text: writeFile(path, gzip.compress(text, compresslevel=1, mtime=0)), files, texts))
+                else:
+                    sizes = list(mapSeasons(writeFeather, files, frames))
+                report[file_format] = {"files": len(files), "bytes": sum(sizes), "seconds": time.perf_counter() - start}
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        # a season rewritten without a format loses that format's file, so it never holds rows of an older run
+        for season in season_rows:
+            for file_format in export_formats:
+                if file_format not in self.formats and os.path.exists(self.getFile(season, file_format)):
+                    os.remove(self.getFile(season, file_format))
+        self.removeStale(list(season_rows), seasons)
+        # seasons of an older run missing from the schema are added by the next loadSchema
+        kept = set(self.getSeasons()) - set(season_rows)
+        self.saveSchema({
+            **{season: dtypes for season, dtypes in self.readSchemaFile().items() if season in kept},
+            **inferDtypes(df, df["season"]),
+        })
+        saveSeasonFile(self.hashes_file, {
+            **{season: value for season, value in stored_hashes.items() if season in kept},
+            **hashes,
+        })
+        return report
+
+    def removeStale(self, kept: list, seasons: list = None):
+        """
+        Remove the partitions of the given seasons which are not kept, or of every season not kept when seasons is None
+        """
+        for season in self.getSeasons() if seasons is None else seasons:
+            if season not in kept:
+                for file_format in export_formats:
+                    if os.path.exists(self.getFile(season, file_format)):
+                        os.remove(self.getFile(season, file_format))
+
+    def combine(self):
+        """
+        Rebuild the combined file from the partitions, the header is written once
+        """
+        with open(self.output_file + ".tmp", "wb") as output:
+            for i, season in enumerate(self.getSeasons()):
+                with open(self.getFile(season), "rb") as f:
+                    header = f.readline()
+                    if i == 0:
+                        output.write(header)
+                    shutil.copyfileobj(f, output, 1 << 20)
+        os.replace(self.output_file + ".tmp", self.output_file)
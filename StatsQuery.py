@@ -0,0 +1,145 @@
+import argparse
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+from CompactStats import readStats
+
+
+class StatsQuery:
+
+    """
+    Indexed lookups over overall_stats_salary.csv, the output of SalaryStatsMatcher
+
+    The table is loaded once, from its compact columnar copy, and indexed by player_id, season, tm and pos and by salary
+    order, so a query only touches the rows of the keys it asks for.
+    The results of the last cache_size queries are kept.
+    """
+
+    def __init__(self, csv_path: str = "./data/overall_stats_salary.csv", cache_size: int = 128):
+        self.csv_path = csv_path
+        self.cache_size = cache_size
+        self.results = OrderedDict()
+        self.hits, self.misses = 0, 0
+        self.load()
+
+    def load(self):
+        self.df = readStats(self.csv_path, sparse=False)
+        # key -> positions of its rows, in table order
+        self.player_index = self.df.groupby("player_id", observed=True).indices
+        self.season_index = self.df.groupby("season", observed=True).indices
+        self.team_index = self.df.groupby("tm", observed=True).indices
+        self.position_index = self.df.groupby("pos", observed=True).indices
+        # positions by ascending salary
+        self.salaries = self.df["salary"].to_numpy(dtype=float)
+        self.salary_order = np.argsort(self.salaries, kind="stable")
+        self.sorted_salaries = self.salaries[self.salary_order]
+        # positions by descending salary, ties in table order, the answer of top without any key
+        self.top_order = np.lexsort((np.arange(len(self.salaries)), -self.salaries))
+        self.top_salaries = -self.salaries[self.top_order]
+        self.results.clear()
+
+    def query(self, player_id: int = None, season: int = None, tm: str = None, pos: str = None,
+              min_salary: float = None, max_salary: float = None, top: int = None, columns: tuple = None) -> pd.DataFrame:
+        """
+        Rows matching every given filter, in table order or by descending salary with top
+        e.g. query(season=2015, pos="C", min_salary=1e7) for the centers of 2015 paid at least 10M
+        """
+        key = (player_id, season, tm, pos, min_salary, max_salary, top, tuple(columns) if columns is not None else None)
+        if key in self.results:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return self.results[key].copy()
+        self.misses += 1
+
+        positions = self.findRows(player_id, season, tm, pos, min_salary, max_salary, top)
+        result = self.df.iloc[positions]
+        if columns is not None:
+            result = result[list(columns)]
+
+        self.results[key] = result
+        if len(self.results) > self.cache_size:
+            self.results.popitem(last=False)
+        return result.copy()
+
+    def findRows(self, player_id, season, tm, pos, min_salary, max_salary, top) -> np.ndarray:
+        keyed = [
+            index.get(value, np.array([], dtype=np.int64))
+            for index, value in [
+                (self.player_index, player_id), (self.season_index, season), (self.team_index, tm), (self.position_index, pos)
+            ]
+            if value is not None
+        ]
+        if not keyed and top is not None:
+            # the highest salaries in the range are a slice of the descending order
+            start = 0 if max_salary is None else np.searchsorted(self.top_salaries, -max_salary, side="left")
+            end = len(self.top_salaries) if min_salary is None else np.searchsorted(self.top_salaries, -min_salary, side="right")
+            return self.top_order[start:end][:top]
+        if not keyed:
+            # only the salary range narrows the rows, read from the sorted salaries
+            start = 0 if min_salary is None else np.searchsorted(self.sorted_salaries, min_salary, side="left")
+            end = len(self.sorted_salaries) if max_salary is None else np.searchsorted(self.sorted_salaries, max_salary, side="right")
+            positions = np.sort(self.salary_order[start:end])
+        else:
+            # the smallest key set first keeps the intersections small
+            keyed.sort(key=len)
+            positions = keyed[0]
+            for other in keyed[1:]:
+                positions = np.intersect1d(positions, other, assume_unique=True)
+            salaries = self.salaries[positions]
+            if min_salary is not None:
+                positions = positions[salaries >= min_salary]
+                salaries = self.salaries[positions]
+            if max_salary is not None:
+                positions = positions[salaries <= max_salary]
+
+        if top is not None:
+            # highest salaries first, ties in table order
+            order = np.lexsort((positions, -self.salaries[positions]))
+            positions = positions[order[:top]]
+        return positions
+
+    def player(self, player_id: int, **filters) -> pd.DataFrame:
+        return self.query(player_id=player_id, **filters)
+
+    def season(self, season: int, **filters) -> pd.DataFrame:
+        return self.query(season=season, **filters)
+
+    def team(self, tm: str, **filters) -> pd.DataFrame:
+        return self.query(tm=tm, **filters)
+
+    def salaryRange(self, min_salary: float = None, max_salary: float = None, **filters) -> pd.DataFrame:
+        return self.query(min_salary=min_salary, max_salary=max_salary, **filters)
+
+    def topSalaries(self, top: int = 10, **filters) -> pd.DataFrame:
+        return self.query(top=top, **filters)
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Query overall_stats_salary.csv, e.g. --season 2015 --pos C --min-salary 10000000")
+    parser.add_argument("--csv-path", default="./data/overall_stats_salary.csv")
+    parser.add_argument("--player-id", type=int)
+    parser.add_argument("--season", type=int, help="e.g. 2015 for 2015-2016")
+    parser.add_argument("--tm", help="team abbreviation, e.g. LAL")
+    parser.add_argument("--pos")
+    parser.add_argument("--min-salary", type=float)
+    parser.add_argument("--max-salary", type=float)
+    parser.add_argument("--top", type=int, help="only the highest paid rows")
+    parser.add_argument("--columns", nargs="+", default=["season", "player_id", "player", "pos", "tm", "salary"],
+                        help="columns to show, all for every column")
+    parser.add_argument("--csv", action="store_true", help="print the rows as csv")
+    args = parser.parse_args(argv)
+
+    columns = None if args.columns == ["all"] else args.columns
+    result = StatsQuery(args.csv_path).query(
+        args.player_id, args.season, args.tm, args.pos, args.min_salary, args.max_salary, args.top, columns
+    )
+    if args.csv:
+        print(result.to_csv(index=False), end="")
+    else:
+        print(result.to_string(index=False))
+        print(f"{len(result)} rows")
+
+
+if __name__ == "__main__":
+    main()
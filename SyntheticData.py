@@ -0,0 +1,154 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+from DataProprocessor import DataPreprocessor
+
+
+class SyntheticData:
+
+    """
+    Scaled up copies of the raw statistics and salary files, used by Benchmark
+
+    Copy 0 is the source data, every further copy repeats all player seasons with new seas_id / player_id and a new name
+    per player made of a first and last name of the source data.
+    collision_rate of the new names are the name of another player, which goes through the duplicated names matching,
+    and misspelling_rate of the players get a typo in their salary name, which goes through the fuzzy matching.
+    Team files are not scaled.
+    """
+
+    # files scaled with the number of players, the other files read by DataPreprocessor are copied as they are
+    player_files = ["Player Season Info.csv", "Player Career Info.csv"] + [
+        file_name for file_name in DataPreprocessor.join_steps.values() if file_name != "Team Summaries.csv"
+    ]
+    team_files = ["Team Summaries.csv"]
+
+    def __init__(self, raw_data_path: str = "./data/raw_statistics", data_path: str = "./data",
+                 collision_rate: float = 0.05, misspelling_rate: float = 0.05, seed: int = 0):
+        self.raw_data_path = raw_data_path
+        self.data_path = data_path
+        self.collision_rate = collision_rate
+        self.misspelling_rate = misspelling_rate
+        self.seed = seed
+
+    def readSource(self, path: str) -> pd.DataFrame:
+        # read as text so the copies keep every value exactly as written
+        return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+    def generate(self, scale: int, output_path: str):
+        """
+        Write scale copies of the data to output_path/raw_statistics and output_path/nba_player_salaries.csv
+        """
+        # the same seed gives the same first copies at every scale
+        rng = np.random.default_rng(self.seed)
+        raw_output_path = os.path.join(output_path, "raw_statistics")
+        os.makedirs(raw_output_path, exist_ok=True)
+
+        season_info = self.readSource(os.path.join(self.raw_data_path, "Player Season Info.csv"))
+        career_info = self.readSource(os.path.join(self.raw_data_path, "Player Career Info.csv"))
+        source_names = pd.Series(career_info["player"].values, index=pd.to_numeric(career_info["player_id"]))
+        self.player_offset = int(max(source_names.index.max(), pd.to_numeric(season_info["player_id"]).max())) + 1
+        self.seas_offset = int(pd.to_numeric(season_info["seas_id"]).max()) + 1
+        # (name, season) -> player_id, for the files and salaries without player_id
+        self.season_ids = season_info.drop_duplicates(subset=["player", "season"]).set_index(["player", "season"])["player_id"]
+        self.salary_ids = season_info.assign(player=season_info["player"].str.strip().str.lower()) \
+            .drop_duplicates(subset=["player", "season"]).set_index(["player", "season"])["player_id"]
+
+        # names of every copy and the names used for them on the salary site
+        copy_names, salary_names = [source_names], [source_names]
+        for _ in range(1, scale):
+            names = self.getNames(source_names, rng)
+            copy_names.append(names)
+            salary_names.append(self.misspellNames(names, self.misspelling_rate, rng))
+
+        for file_name in self.player_files:
+            df = self.readSource(os.path.join(self.raw_data_path, file_name))
+            output_file = os.path.join(raw_output_path, file_name)
+            for copy in range(scale):
+                # written copy by copy so only 1 copy is in memory
+                self.copyFrame(df, copy, copy_names[copy]).to_csv(
+                    output_file, mode="w" if copy == 0 else "a", header=copy == 0, index=False
+                )
+        for file_name in self.team_files:
+            shutil.copy(os.path.join(self.raw_data_path, file_name), os.path.join(raw_output_path, file_name))
+
+        salary_df = self.readSource(os.path.join(self.data_path, "nba_player_salaries.csv"))
+        output_file = os.path.join(output_path, "nba_player_salaries.csv")
+        for copy in range(scale):
+            self.copySalaries(salary_df, copy, salary_names[copy], rng).to_csv(
+                output_file, mode="w" if copy == 0 else "a", header=copy == 0, index=False
+            )
+
+    def getNames(self, source_names: pd.Series, rng: np.random.Generator) -> pd.Series:
+        """
+        New name for every player, a first and last name of the source data or the name of another player
+        """
+        parts = source_names.str.split(" ", n=1)
+        first_names = parts.str[0].to_numpy()
+        last_names = parts.str[1].dropna().to_numpy()
+
+        n = len(source_names)
+        names = pd.Series(rng.choice(first_names, n), index=source_names.index) + " " + rng.choice(last_names, n)
+        collide = rng.random(n) < self.collision_rate
+        names[collide] = rng.choice(source_names.to_numpy(), collide.sum())
+        return names
+
+    def misspellNames(self, names: pd.Series, rate: float, rng: np.random.Generator) -> pd.Series:
+        names = names.copy()
+        misspelled = rng.random(len(names)) < rate
+        names[misspelled] = [self.misspell(name, rng) for name in names[misspelled]]
+        return names
+
+    @staticmethod
+    def misspell(name: str, rng: np.random.Generator) -> str:
+        """
+        A typo in name, a letter dropped, doubled, swapped with the next one or replaced
+        """
+        if len(name) < 4:
+            return name
+        i = int(rng.integers(1, len(name) - 2))
+        typo = rng.integers(4)
+        if typo == 0:
+            return name[:i] + name[i+1:]
+        if typo == 1:
+            return name[:i] + name[i] + name[i:]
+        if typo == 2:
+            return name[:i] + name[i+1] + name[i] + name[i+2:]
+        return name[:i] + chr(int(rng.integers(ord("a"), ord("z") + 1))) + name[i+1:]
+
+    def copyFrame(self, df: pd.DataFrame, copy: int, names: pd.Series) -> pd.DataFrame:
+        if copy == 0:
+            return df
+        df = df.copy()
+        if "player_id" in df.columns:
+            ids = pd.to_numeric(df["player_id"]).to_numpy()
+        else:
+            # e.g. All-Star Selections only has the player name
+            ids = pd.to_numeric(self.season_ids.reindex(pd.MultiIndex.from_frame(df[["player", "season"]])).to_numpy())
+            found = ~np.isnan(ids)
+            df, ids = df[found], ids[found].astype(np.int64)
+
+        if "player" in df.columns:
+            ids_series = pd.Series(ids)
+            df["player"] = np.where(ids_series.isin(names.index), ids_series.map(names), df["player"])
+        if "player_id" in df.columns:
+            df["player_id"] = (ids + copy * self.player_offset).astype(str)
+        if "seas_id" in df.columns:
+            df["seas_id"] = (pd.to_numeric(df["seas_id"]) + copy * self.seas_offset).astype(str)
+        return df
+
+    def copySalaries(self, salary_df: pd.DataFrame, copy: int, names: pd.Series, rng: np.random.Generator) -> pd.DataFrame:
+        if copy == 0:
+            return salary_df
+        salary_df = salary_df.copy()
+        keys = pd.MultiIndex.from_arrays([salary_df["Player Name"].str.strip().str.lower(), salary_df["Year"].str[:4]])
+        ids = pd.to_numeric(pd.Series(self.salary_ids.reindex(keys).to_numpy()))
+        copy_names = ids.map(names)
+
+        # names not matching any player are already fuzzy matched in the source, they get another typo
+        unmatched = copy_names.isna().to_numpy()
+        unmatched_names = salary_df.loc[unmatched, "Player Name"].drop_duplicates()
+        typos = pd.Series([self.misspell(name, rng) for name in unmatched_names], index=unmatched_names.to_numpy())
+        salary_df["Player Name"] = np.where(unmatched, salary_df["Player Name"].map(typos), copy_names)
+        return salary_df
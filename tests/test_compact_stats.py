@@ -0,0 +1,42 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from CompactStats import compactFrame, readStats
+
+stats_csv = """season,seas_id,player_id,player,pos,tm,g,per,All-NBA,mvp_share,mvp_winner,playoffs,salary
+1990,1,1,A.C. Green,PF,LAL,82,15.123456789,,0.5,True,True,1234567.0
+1990,2,2,Adrian Dantley,SF,DAL,45,,1st,,,False,2345678.0
+1991,3,1,A.C. Green,PF,LAL,82,14.2,,,,True,1300000.0
+"""
+
+
+def readCsv() -> pd.DataFrame:
+    return pd.read_csv(io.StringIO(stats_csv))
+
+
+def test_dtypes_do_not_depend_on_the_rows():
+    df = readCsv()
+    whole = compactFrame(df, sparse=False)
+    # 1991 alone has no NaN in per and nothing in the award columns, read with the dtypes of the whole file
+    season = compactFrame(df[df["season"] == 1991].astype(df.dtypes.to_dict()), sparse=False)
+
+    pd.testing.assert_series_equal(season.dtypes.astype(str), whole.dtypes.astype(str))
+    assert whole["per"].dtype == np.float32
+    assert whole["mvp_winner"].dtype == np.float32 and whole["mvp_winner"].iloc[0] == 1.0
+    assert whole["salary"].dtype == np.float64
+    assert whole["player_id"].dtype == np.int32
+
+
+def test_precise_frame_writes_the_same_csv(tmp_path):
+    csv_path = tmp_path / "all_stats.csv"
+    csv_path.write_text(stats_csv)
+
+    precise = readStats(str(csv_path), sparse=False, precise=True)
+    compact = readStats(str(csv_path), sparse=False)
+
+    assert precise.to_csv(index=False) == readCsv().to_csv(index=False)
+    # both copies are kept side by side
+    assert compact["per"].dtype == np.float32
+    assert readStats(str(csv_path), sparse=False, precise=True)["per"].dtype == np.float64
@@ -0,0 +1,48 @@
+import os
+import shutil
+
+import pandas as pd
+
+from DataProprocessor import DataPreprocessor
+
+# the raw files DataPreprocessor reads cut down to 10 players of 2022 and 2023, award winners and All-NBA players included
+fixture_path = os.path.join(os.path.dirname(__file__), "fixtures", "raw_statistics")
+
+
+def copyRawData(path) -> str:
+    raw_path = path / "raw_statistics"
+    shutil.copytree(fixture_path, raw_path)
+    pd.DataFrame({"Year": ["2022-2023", "2023-2024"]}).to_csv(path / "nba_player_salaries.csv", index=False)
+    return str(raw_path)
+
+
+def test_repeated_award_of_a_player_repeats_his_row(tmp_path):
+    raw_path = copyRawData(tmp_path)
+    awards = pd.read_csv(os.path.join(raw_path, "Player Award Shares.csv"), dtype=str, keep_default_na=False)
+    # the same award twice for 1 player season, with another share
+    repeated = awards.iloc[[0]].assign(share="0.001")
+    pd.concat([awards, repeated]).to_csv(os.path.join(raw_path, "Player Award Shares.csv"), index=False)
+
+    DataPreprocessor(raw_data_path=raw_path, data_path=str(tmp_path))
+    all_stats = pd.read_csv(tmp_path / "all_stats.csv")
+
+    # pivot would raise, the award is joined on its own like pd.merge did and the player season comes out twice
+    assert all_stats["seas_id"].value_counts()[int(awards["seas_id"].iloc[0])] == 2
+    assert all_stats["seas_id"].duplicated().sum() == 1
+    award = awards["award"].iloc[0].replace("aba", "nba")
+    assert sorted(all_stats.loc[all_stats["seas_id"] == int(awards["seas_id"].iloc[0]), f"{award}_share"]) == [0.001, float(awards["share"].iloc[0])]
+
+
+def test_chunks_of_1_season_write_the_same_file(tmp_path):
+    raw_path = copyRawData(tmp_path)
+    (tmp_path / "whole").mkdir()
+    (tmp_path / "chunks").mkdir()
+    for name in ["whole", "chunks"]:
+        shutil.copy(tmp_path / "nba_player_salaries.csv", tmp_path / name)
+
+    DataPreprocessor(raw_data_path=raw_path, data_path=str(tmp_path / "whole"), chunk_size=None)
+    DataPreprocessor(raw_data_path=raw_path, data_path=str(tmp_path / "chunks"), chunk_size=1)
+
+    whole = (tmp_path / "whole" / "all_stats.csv").read_bytes()
+    assert pd.read_csv(tmp_path / "whole" / "all_stats.csv")["season"].nunique() == 2
+    assert (tmp_path / "chunks" / "all_stats.csv").read_bytes() == whole
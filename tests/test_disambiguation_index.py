@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from DisambiguationIndex import DisambiguationIndex
+
+nan = np.nan
+
+
+def test_build_matches_hand_computed_table():
+    repeated_names = pd.DataFrame({
+        "player": ["mike james"] * 3 + ["tony smith"] * 2 + ["jon doe"] * 2,
+        "player_id": [10, 11, 12, 20, 21, 30, 31],
+    })
+    career_info = pd.DataFrame({
+        "player_id": [10, 11, 12, 20, 21, 30, 31],
+        # 3 players of 1 name overlapping in 1994 and 1996, 12 plays a single season
+        # 21 has a zero-length career, no season at all, 30 and 31 have the same career
+        "first_seas": [1990, 1994, 1996, 1991, 1993, 1990, 1990],
+        "last_seas": [1994, 1996, 1996, 1991, 1992, 1992, 1992],
+    })
+
+    table = DisambiguationIndex.build(repeated_names, career_info).table
+
+    expected = pd.DataFrame([
+        ["jon doe", 1990, nan, True],
+        ["jon doe", 1991, nan, True],
+        ["jon doe", 1992, nan, True],
+        ["mike james", 1990, 10.0, False],
+        ["mike james", 1991, 10.0, False],
+        ["mike james", 1992, 10.0, False],
+        ["mike james", 1993, 10.0, False],
+        ["mike james", 1994, nan, True],
+        ["mike james", 1995, 11.0, False],
+        ["mike james", 1996, nan, True],
+        ["tony smith", 1991, 20.0, False],
+    ], columns=DisambiguationIndex.columns)
+    pd.testing.assert_frame_equal(table, expected)
+
+
+def test_lookup_of_seasons_outside_the_careers():
+    repeated_names = pd.DataFrame({"player": ["mike james", "mike james"], "player_id": [10, 11]})
+    career_info = pd.DataFrame({"player_id": [10, 11], "first_seas": [1990, 1994], "last_seas": [1994, 1996]})
+    index = DisambiguationIndex.build(repeated_names, career_info)
+
+    names = pd.Series(["mike james"] * 4)
+    seasons = pd.Series([1989, 1993, 1994, 1997])
+    np.testing.assert_array_equal(index.lookup(names, seasons), [nan, 10.0, nan, nan])
+    assert index.isAmbiguous(names, seasons).tolist() == [False, False, True, False]
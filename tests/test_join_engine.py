@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from JoinEngine import JoinEngine
+
+
+def chainedMerge(base_df: pd.DataFrame, tables: list) -> pd.DataFrame:
+    # what the joins replaced, 1 pd.merge per table and the fill value applied to its columns
+    df = base_df
+    for table, on, fill_value in tables:
+        before = set(df.columns)
+        df = pd.merge(df, table, on=on, how="left")
+        if fill_value is not None:
+            added = [column for column in df.columns if column not in before]
+            df[added] = df[added].fillna(fill_value)
+    return df
+
+
+def test_join_matches_chained_merge():
+    base_df = pd.DataFrame({
+        "seas_id": [1, 2, 3, 4],
+        "season": [1990, 1990, 1991, 1991],
+        "g": [82, 45, 80, 10],
+    })
+    tables = [
+        # g overlaps the base table, g_x / g_y
+        (pd.DataFrame({"seas_id": [1, 2, 4], "g": [70, 40, 5], "per": [15.1, 9.2, np.nan]}), ["seas_id"], None),
+        # seas_id 2 twice multiplies its row, seas_id 3 missing gets the fill value
+        (pd.DataFrame({"seas_id": [1, 2, 2, 4], "share": [0.5, 0.1, 0.2, np.nan]}), ["seas_id"], 0),
+        # a second key and a text column without a match
+        (pd.DataFrame({"season": [1990], "seas_id": [1], "All-NBA": ["1st"]}), ["season", "seas_id"], None),
+    ]
+
+    join_engine = JoinEngine(base_df)
+    for table, on, fill_value in tables:
+        join_engine.add(table, on=on, fill_value=fill_value)
+    joined = join_engine.join()
+
+    expected = chainedMerge(base_df, tables)
+    assert list(joined.columns) == ["seas_id", "season", "g_x", "g_y", "per", "share", "All-NBA"]
+    assert joined["seas_id"].tolist() == [1, 2, 2, 3, 4]
+    assert joined["share"].tolist() == [0.5, 0.1, 0.2, 0, 0]
+    pd.testing.assert_frame_equal(joined, expected)
@@ -0,0 +1,83 @@
+import csv
+import os
+
+import pandas as pd
+
+from SalaryStatsMatcher import SalaryStatsMatcher
+
+season_info_header = ["season", "player_id", "player"]
+career_info_header = ["player_id", "player", "first_seas", "last_seas"]
+salaries_header = ["Year", "Player Name", "Salary (Adjusted)", "Salary (Unadjusted)"]
+
+# 2020: "Jon Doe" is only close to Jonathan Doe and "Chris Paulsen" to Chris Paulson
+season_info = [
+    [2020, 1, "Stephen Curry"],
+    [2020, 2, "Jonathan Doe"],
+    [2020, 3, "Mike Brown"],
+    [2020, 5, "Chris Paulson"],
+]
+career_info = [
+    [1, "Stephen Curry", 2009, 2020],
+    [2, "Jonathan Doe", 2020, 2020],
+    [3, "Mike Brown", 2020, 2020],
+    [5, "Chris Paulson", 2020, 2020],
+]
+salaries = [
+    ["2020-2021", "Stephen Curry", "$43,006,362", "$43,006,362"],
+    ["2020-2021", "Jon Doe", "$1,000,000", "$1,000,000"],
+    ["2020-2021", "Mike Brown", "$2,000,000", "$2,000,000"],
+    ["2020-2021", "Chris Paulsen", "$3,000,000", "$3,000,000"],
+]
+
+# 2021: a player really named Jon Doe comes in, "Jon Doe" becomes a direct match in every season
+new_season_info = [[2021, 1, "Stephen Curry"], [2021, 4, "Jon Doe"]]
+new_career_info = [[4, "Jon Doe", 2021, 2021]]
+new_salaries = [
+    ["2021-2022", "Stephen Curry", "$45,780,966", "$45,780,966"],
+    ["2021-2022", "Jon Doe", "$1,100,000", "$1,100,000"],
+]
+
+
+def writeCsv(path, header, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def writeSources(root, append: bool):
+    os.makedirs(root / "raw", exist_ok=True)
+    os.makedirs(root / "data", exist_ok=True)
+    writeCsv(root / "raw" / "Player Season Info.csv", season_info_header, season_info + (new_season_info if append else []))
+    # the career of Stephen Curry goes on in the new season
+    careers = [row if row[0] != 1 or not append else [1, "Stephen Curry", 2009, 2021] for row in career_info]
+    writeCsv(root / "raw" / "Player Career Info.csv", career_info_header, careers + (new_career_info if append else []))
+    writeCsv(root / "data" / "nba_player_salaries.csv", salaries_header, salaries + (new_salaries if append else []))
+
+
+def matchNames(root, use_cache: bool) -> SalaryStatsMatcher:
+    matcher = SalaryStatsMatcher(use_cache=use_cache, raw_data_path=str(root / "raw"), data_path=str(root / "data"), run=False)
+    matcher.loadSalaries()
+    matcher.nameMatching()
+    return matcher
+
+
+def test_cached_resolution_after_append_equals_full_recompute(tmp_path):
+    cached_root, full_root = tmp_path / "cached", tmp_path / "full"
+
+    writeSources(cached_root, append=False)
+    first = matchNames(cached_root, use_cache=True)
+    assert dict(zip(first.salary_df["player_name"], first.salary_df["player_id"])) == {
+        "Stephen Curry": 1, "Jon Doe": 2, "Mike Brown": 3, "Chris Paulsen": 5,
+    }
+
+    writeSources(cached_root, append=True)
+    cached = matchNames(cached_root, use_cache=True)
+    writeSources(full_root, append=True)
+    full = matchNames(full_root, use_cache=False)
+
+    pd.testing.assert_frame_equal(cached.salary_df, full.salary_df)
+    # the fuzzy match of the first season changes with the new direct match
+    assert cached.salary_df["player_id"].tolist() == [1, 4, 3, 5, 1, 4]
+    # 2020 still has the same candidates so the score of Chris Paulsen is reused
+    assert cached.instrumentation.counters["cached_fuzzy_scores"] == 1
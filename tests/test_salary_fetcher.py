@@ -0,0 +1,132 @@
+import csv
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from SalaryFetcher import SalaryFetcher, header
+
+fixture_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "hoopshype")
+
+
+class SalaryPages(BaseHTTPRequestHandler):
+
+    """
+    Stand-in for hoopshype serving the fixture pages, with ETag revalidation
+    """
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        file_name = self.server.pages.get(self.path)
+        if file_name is None:
+            self.send_error(404)
+            return
+        with open(os.path.join(fixture_path, file_name), "rb") as f:
+            body = f.read()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SalaryPages)
+    server.requests = list()
+    server.pages = {
+        "/salaries/players/2021-2022/": "2021-2022.html",
+        "/salaries/players/2022-2023/": "2022-2023.html",
+        "/salaries/players/": "2023-2024.html",
+    }
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def makeFetcher(server, tmp_path, current_season: int = 2023) -> SalaryFetcher:
+    return SalaryFetcher(
+        base_url=f"http://127.0.0.1:{server.server_address[1]}/salaries/players/", first_season=2021, current_season=current_season,
+        cache_path=str(tmp_path / "hoopshype"), output_file=str(tmp_path / "nba_player_salaries.csv"),
+        requests_per_second=0,
+    )
+
+
+def readOutput(tmp_path) -> list:
+    with open(tmp_path / "nba_player_salaries.csv", newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_run_writes_every_season_in_order(server, tmp_path):
+    assert makeFetcher(server, tmp_path).run() == 6
+
+    assert readOutput(tmp_path) == [
+        header,
+        ["2021-2022", "Stephen Curry", "$45,780,966", "$51,915,615"],
+        ["2021-2022", "Nenê", "$1,669,178", "$1,892,846"],
+        ["2022-2023", "Stephen Curry", "$48,070,014", "$50,753,843"],
+        ["2022-2023", "Tim Hardaway Jr.", "$18,975,000", "$20,034,376"],
+        # the current season has no adjusted salary yet
+        ["2023-2024", "Stephen Curry", "$51,915,615", "$51,915,615"],
+        ["2023-2024", "Victor Wembanyama", "$12,160,680", "$12,160,680"],
+    ]
+
+
+def test_second_run_only_revalidates_current_season(server, tmp_path):
+    makeFetcher(server, tmp_path).run()
+    first_output = readOutput(tmp_path)
+    server.requests.clear()
+
+    makeFetcher(server, tmp_path).run()
+
+    # past seasons come from the cache, the current season is answered with 304
+    assert server.requests == ["/salaries/players/"]
+    assert readOutput(tmp_path) == first_output
+    assert not [file_name for file_name in os.listdir(tmp_path / "hoopshype") if file_name.endswith(".tmp")]
+
+
+def test_missing_table_raises_and_is_not_cached(server, tmp_path):
+    server.pages["/salaries/players/2021-2022/"] = "error.html"
+    fetcher = makeFetcher(server, tmp_path)
+    os.makedirs(fetcher.cache_path)
+
+    with pytest.raises(ValueError, match="salary table not found"):
+        fetcher.fetchSeason(2021)
+    assert not os.path.exists(fetcher.getCacheFile(2021, ".csv"))
+    assert not os.path.exists(fetcher.getCacheFile(2021, ".html"))
+
+    # the season is fetched again once the page is back
+    server.pages["/salaries/players/2021-2022/"] = "2021-2022.html"
+    assert len(fetcher.fetchSeason(2021)) == 2
+    assert os.path.exists(fetcher.getCacheFile(2021, ".csv"))
+
+
+def test_season_cached_as_current_is_fetched_again_once_over(server, tmp_path):
+    # while 2022 is the current season it comes from the base url, without adjusted salaries
+    server.pages["/salaries/players/"] = "2023-2024.html"
+    makeFetcher(server, tmp_path, current_season=2022).run()
+    assert readOutput(tmp_path)[-1] == ["2022-2023", "Victor Wembanyama", "$12,160,680", "$12,160,680"]
+    server.requests.clear()
+
+    makeFetcher(server, tmp_path).run()
+
+    # 2021 is still read from the cache, 2022 gets its season page with the adjusted salaries
+    assert sorted(server.requests) == ["/salaries/players/", "/salaries/players/2022-2023/"]
+    assert readOutput(tmp_path)[3:5] == [
+        ["2022-2023", "Stephen Curry", "$48,070,014", "$50,753,843"],
+        ["2022-2023", "Tim Hardaway Jr.", "$18,975,000", "$20,034,376"],
+    ]
+    assert not [file_name for file_name in os.listdir(tmp_path / "hoopshype") if file_name.startswith("2022-2023.current")]
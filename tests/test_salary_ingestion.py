@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from SalaryIngestion import normalizeNames, parseSalaries, readSalaries
+
+
+def test_parse_salaries_keeps_empty_cells_as_nan():
+    salaries = parseSalaries(pd.Series(["$9,982,396", "", "$1,000"]))
+
+    assert salaries.dtype == np.float64
+    assert salaries[0] == 9982396.0 and np.isnan(salaries[1]) and salaries[2] == 1000.0
+
+
+def test_read_salaries(tmp_path):
+    csv_path = tmp_path / "nba_player_salaries.csv"
+    csv_path.write_text(
+        "Year,Player Name,Salary (Adjusted),Salary (Unadjusted)\n"
+        "2021-2022,Nenê,\"$1,892,846\",\"$1,669,178\"\n"
+        "2023-2024,Victor Wembanyama,,\"$12,160,680\"\n",
+        encoding="utf-8",
+    )
+
+    df = readSalaries(str(csv_path))
+
+    assert df["season"].tolist() == [2021, 2023]
+    assert df["player"].tolist() == ["nene", "victor wembanyama"]
+    assert df["salary"].isna().tolist() == [False, True]
+    assert normalizeNames(pd.Series(["J.J. Redick", "Tim Hardaway Jr."])).tolist() == ["jj redick", "tim hardaway jr"]
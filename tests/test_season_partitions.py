@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from SeasonPartitions import SeasonPartitions
+
+
+def test_read_uses_dtypes_of_combined_file(tmp_path):
+    df = pd.DataFrame({
+        "season": [1990, 1990, 1991],
+        "player_id": [1, 2, 1],
+        # no missing value in 1991, read alone it would be int
+        "g": [82, np.nan, 80],
+        # no value at all in 1991, read alone it would be float
+        "award": ["mvp", None, None],
+    })
+    partitions = SeasonPartitions(str(tmp_path / "all_stats.csv"))
+    partitions.write(df)
+    partitions.combine()
+
+    combined = pd.read_csv(tmp_path / "all_stats.csv")
+    season = partitions.read([1991])
+
+    pd.testing.assert_series_equal(season.dtypes, combined.dtypes)
+    assert season.to_csv(index=False) == combined[combined["season"] == 1991].to_csv(index=False)
+
+
+def test_schema_follows_rewritten_and_removed_seasons(tmp_path):
+    partitions = SeasonPartitions(str(tmp_path / "all_stats.csv"))
+    partitions.write(pd.DataFrame({"season": [1990, 1991], "g": [82.5, 80.0]}))
+    # 1990 rewritten with whole numbers and 1991 removed, g is int again everywhere
+    partitions.write(pd.DataFrame({"season": [1990], "g": [82]}), seasons=[1990, 1991])
+
+    assert partitions.getSeasons() == [1990]
+    assert partitions.read([1990])["g"].dtype == np.int64
+
+
+def test_unchanged_seasons_are_not_written_again(tmp_path):
+    partitions = SeasonPartitions(str(tmp_path / "all_stats.csv"))
+    df = pd.DataFrame({"season": [1990, 1990, 1991], "g": [82, 80, 79]})
+    assert partitions.write(df)["csv"]["files"] == 2
+    assert partitions.write(df)["csv"]["files"] == 0
+
+    df.loc[2, "g"] = 78
+    assert partitions.write(df)["csv"]["files"] == 1
+    assert partitions.read([1991])["g"].tolist() == [78]
+    # a partition removed by hand is written again
+    (tmp_path / "partitions" / "all_stats" / "season=1990.csv").unlink()
+    assert partitions.write(df)["csv"]["files"] == 1
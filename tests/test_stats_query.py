@@ -0,0 +1,47 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from StatsQuery import StatsQuery
+
+
+def makeTable(tmp_path) -> str:
+    rng = np.random.default_rng(0)
+    n = 200
+    df = pd.DataFrame({
+        "season": rng.integers(2000, 2005, n),
+        "player_id": rng.integers(1, 30, n),
+        "player": [f"player {i}" for i in range(n)],
+        "pos": rng.choice(["C", "PF", "PG"], n),
+        "tm": rng.choice(["LAL", "BOS", "MIA"], n),
+        # repeated salaries so ties are ordered by the table order
+        "salary": rng.choice([1e6, 2.5e6, 1e7, 3e7], n),
+    })
+    csv_path = tmp_path / "overall_stats_salary.csv"
+    df.to_csv(csv_path, index=False)
+    return str(csv_path)
+
+
+def test_query_matches_a_filter_of_the_whole_table(tmp_path):
+    csv_path = makeTable(tmp_path)
+    stats_query = StatsQuery(csv_path)
+    df = pd.read_csv(csv_path)
+
+    filters = itertools.product([None, 2001], [None, "C"], [None, 2.5e6], [None, 1e7], [None, 5])
+    for season, pos, min_salary, max_salary, top in filters:
+        mask = pd.Series(True, index=df.index)
+        if season is not None:
+            mask &= df["season"] == season
+        if pos is not None:
+            mask &= df["pos"] == pos
+        if min_salary is not None:
+            mask &= df["salary"] >= min_salary
+        if max_salary is not None:
+            mask &= df["salary"] <= max_salary
+        expected = df[mask]
+        if top is not None:
+            expected = expected.sort_values("salary", ascending=False, kind="stable").head(top)
+
+        result = stats_query.query(season=season, pos=pos, min_salary=min_salary, max_salary=max_salary, top=top)
+        assert result["player"].tolist() == expected["player"].tolist(), (season, pos, min_salary, max_salary, top)
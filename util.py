@@ -1,3 +1,13 @@
+import hashlib
+import os
+import sys
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
 na_values = ["", 
              "#N/A", 
              "#N/A N/A", 
@@ -15,4 +25,35 @@ na_values = ["",
              "n/a", 
              "nan", 
              "null"
-             ]
\ No newline at end of file
+             ]
+
+def fileFingerprint(path: str) -> str:
+    """
+    Content hash of a file, used to invalidate anything derived from it
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def peakMemoryMB() -> float:
+    """
+    Peak resident memory of the process so far in MB, NaN where it cannot be measured
+    """
+    if resource is None:
+        return float("nan")
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+def currentMemoryMB() -> float:
+    """
+    Resident memory of the process in MB, NaN where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except OSError:
+        return float("nan")
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1 << 20)